@@ -0,0 +1,22 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from src.data.db_manager import DatabaseManager
+from src.data.maintenance import compact_snapshots
+from src.utils.config import COMPACT_DAILY_AFTER_DAYS, COMPACT_WEEKLY_AFTER_DAYS
+
+def run_compaction(dry_run=False):
+    """Apply the snapshot retention policy now; --dry-run only reports what would be deleted"""
+    db = DatabaseManager()
+    try:
+        stats = compact_snapshots(db, COMPACT_DAILY_AFTER_DAYS, COMPACT_WEEKLY_AFTER_DAYS, dry_run=dry_run)
+        if dry_run:
+            print(f"✅ Would delete {stats['candidates']} of {stats['checked']} old snapshots")
+        else:
+            print(f"✅ Deleted {stats['deleted']} of {stats['checked']} old snapshots in {stats['batches']} batches")
+    except Exception as e:
+        print(f"❌ Error compacting snapshots: {str(e)}")
+
+if __name__ == "__main__":
+    run_compaction(dry_run='--dry-run' in sys.argv)
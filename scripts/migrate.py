@@ -0,0 +1,33 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from src.data.db_manager import DatabaseManager
+from src.data.maintenance import delete_snapshots, duplicate_snapshots
+from src.data.migrations import MIGRATIONS, SNAPSHOT_DAY_KEY_VERSION, applied_versions, upgrade
+
+def show_status():
+    """List the migrations and whether each is applied"""
+    db = DatabaseManager()  # Applies pending automatic migrations
+    applied = applied_versions(db.engine) or set()
+    for migration in MIGRATIONS:
+        state = 'applied' if migration.version in applied else ('pending (manual)' if migration.manual else 'pending')
+        print(f"{migration.version:>3}  {state:<17} {migration.description}")
+    if SNAPSHOT_DAY_KEY_VERSION not in applied:
+        delete_snapshots(db, duplicate_snapshots(), dry_run=True, label='Same-day duplicates')
+
+def run_upgrade(include_manual=False):
+    """Apply pending migrations ahead of a deploy; --manual also applies the ones that change data"""
+    db = DatabaseManager()
+    try:
+        applied = upgrade(db, include_manual)
+        print(f"✅ Schema up to date (migrations applied: {', '.join(str(v) for v in sorted(applied))})")
+    except Exception as e:
+        print(f"❌ Migration failed: {str(e)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'upgrade':
+        run_upgrade(include_manual='--manual' in sys.argv)
+    else:
+        show_status()
@@ -0,0 +1,42 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import text
+from src.data.db_manager import DatabaseManager, ReferralData
+
+JSONB_COLUMNS = {
+    'referral_data': ('recommending_me', 'my_recommendations'),
+    'latest_snapshot': ('recommending_me', 'my_recommendations'),
+}
+
+def migrate_jsonb():
+    """Convert the snapshot JSON columns to JSONB and add the GIN containment indexes (PostgreSQL only)"""
+    db = DatabaseManager()
+    if db.engine.dialect.name != 'postgresql':
+        print(f"Skipping: JSONB is PostgreSQL-only (database is {db.engine.dialect.name})")
+        return
+
+    with db.engine.begin() as conn:
+        for table, columns in JSONB_COLUMNS.items():
+            for column in columns:
+                data_type = conn.execute(text(
+                    "SELECT data_type FROM information_schema.columns "
+                    "WHERE table_name = :table AND column_name = :column"
+                ), {'table': table, 'column': column}).scalar()
+                if data_type == 'json':
+                    print(f"Converting {table}.{column} to jsonb...")
+                    conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE jsonb USING {column}::jsonb"))
+                else:
+                    print(f"{table}.{column} is already {data_type}")
+
+        for index in ReferralData.__table__.indexes:
+            if index.dialect_options['postgresql']['using'] == 'gin':
+                column = index.columns[0].name
+                print(f"Creating {index.name}...")
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index.name} ON referral_data "
+                                  f"USING gin ({column} jsonb_path_ops)"))
+    print("✅ Snapshot columns are JSONB with GIN indexes")
+
+if __name__ == "__main__":
+    migrate_jsonb()
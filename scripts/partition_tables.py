@@ -0,0 +1,46 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from datetime import datetime
+from src.data.db_manager import DatabaseManager, Base
+from src.data.migrations import prepare_partitioning
+from src.data.partitioning import PARTITIONED_TABLES, is_partitioned, partition_table, ensure_partitions, \
+    detach_partitions_before
+
+def partition_tables(drop_snapshot_day_key=False):
+    """Convert referral_data and referral_snapshot_row to monthly range partitions (PostgreSQL only).
+
+    referral_data is skipped while the (account, day) snapshot key is in use, unless drop_snapshot_day_key.
+    """
+    db = DatabaseManager()
+    if db.engine.dialect.name != 'postgresql':
+        print(f"Skipping: partitioning is PostgreSQL-only (database is {db.engine.dialect.name})")
+        return
+
+    for table, column in PARTITIONED_TABLES.items():
+        with db.engine.begin() as conn:
+            if is_partitioned(conn, table):
+                print(f"{table} is already partitioned")
+                continue
+            try:
+                prepare_partitioning(conn, table, drop_snapshot_day_key)
+            except RuntimeError as e:
+                print(f"❌ Skipping {table}: {str(e)} (rerun with --drop-snapshot-day-key to give up upserts)")
+                continue
+            print(f"Partitioning {table} by month of {column}...")
+            partition_table(conn, table, column, Base.metadata.tables[table].indexes)
+    names = ensure_partitions(db.engine)
+    print(f"✅ Monthly partitions ready ({len(names)} current/upcoming partitions checked)")
+
+def detach_before(cutoff):
+    """Detach the partitions holding data older than cutoff (YYYY-MM-DD); the tables are kept for archiving"""
+    db = DatabaseManager()
+    detached = detach_partitions_before(db.engine, datetime.strptime(cutoff, '%Y-%m-%d'))
+    print(f"✅ Detached {len(detached)} partitions: {', '.join(detached) or 'none'}")
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == '--detach-before':
+        detach_before(sys.argv[2])
+    else:
+        partition_tables(drop_snapshot_day_key='--drop-snapshot-day-key' in sys.argv)
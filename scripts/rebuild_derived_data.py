@@ -0,0 +1,46 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from src.data.db_manager import DatabaseManager
+
+def rebuild_snapshot_rows(db):
+    print("Rebuilding referral_snapshot_row from referral_data...")
+    records, rows = db.backfill_snapshot_rows()
+    print(f"✅ Wrote {rows} partner rows for {records} records")
+
+def rebuild_rollups(db):
+    print("Rebuilding account_rollup and partner_rollup from referral_snapshot_row...")
+    accounts = db.rebuild_rollups()
+    print(f"✅ Rebuilt day/week/month rollups for {accounts} accounts")
+
+def rebuild_latest_snapshots(db):
+    print("Rebuilding latest_snapshot from referral_data...")
+    accounts = db.rebuild_latest_snapshots()
+    print(f"✅ Stored latest snapshots for {accounts} accounts")
+
+def rebuild_baselines(db):
+    print("Rebuilding partner_baseline from referral_snapshot_row...")
+    baselines = db.rebuild_baselines()
+    print(f"✅ Stored {baselines} partner baselines")
+
+def rebuild_daily_series(db):
+    if not db.materialize_daily_series:
+        print("Skipping daily_series (MATERIALIZE_DAILY_SERIES is off)")
+        return
+    print("Rebuilding daily_series from the day rollups...")
+    rows = db.rebuild_daily_series()
+    print(f"✅ Stored {rows} daily partner values")
+
+def rebuild_derived_data():
+    """Rebuild every table derived from the referral_data JSON columns"""
+    db = DatabaseManager()
+    rebuild_snapshot_rows(db)
+    rebuild_rollups(db)
+    rebuild_latest_snapshots(db)
+    rebuild_baselines(db)
+    rebuild_daily_series(db)
+    db.bump_maintenance_version()
+
+if __name__ == "__main__":
+    rebuild_derived_data()
@@ -0,0 +1,18 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from src.data.db_manager import DatabaseManager
+
+def refresh_recommendations():
+    """Recompute the stored partnership recommendations outside the scraper run"""
+    db = DatabaseManager()
+    try:
+        stats = db.refresh_partner_recommendations()
+        print(f"✅ Stored {stats['recommendations']} recommendations for {stats['accounts']} accounts "
+              f"in {stats['seconds']:.2f}s")
+    except Exception as e:
+        print(f"❌ Error refreshing recommendations: {str(e)}")
+
+if __name__ == "__main__":
+    refresh_recommendations()
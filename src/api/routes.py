@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify, render_template_string, send_from_directory, make_response, render_template, session, redirect, url_for
+from flask import Flask, request, jsonify, render_template_string, send_from_directory, make_response, render_template, session, redirect, url_for, g
 from flask_cors import CORS
 from datetime import datetime, timedelta
 import sys
@@ -9,10 +9,17 @@ from sqlalchemy.sql import func
 import json
 import pytz  # Add this import at the top
 from functools import wraps
+import hashlib
 
 # Add the project root to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-from src.data.db_manager import DatabaseManager, ReferralData, AllowedAccount
+from src.data.db_manager import (DatabaseManager, ReferralData, AllowedAccount, LatestSnapshot, SnapshotView,
+                                 DATA_VERSION_ALL, DATA_VERSION_MAINTENANCE)
+from src.data.recommendations import build_recommendations, RECOMMENDATION_WINDOW_DAYS
+from src.data.maintenance import delete_snapshots, duplicate_snapshots, initial_data_snapshots
+from src.data.csv_import import import_csv
+from src.utils.config import RESPONSE_CACHE_SIZE
+from src.utils.response_cache import ResponseCache
 from src.scraper.scheduler import ScraperScheduler
 
 app = Flask(__name__, static_folder='../../frontend/build', static_url_path='/')
@@ -55,6 +62,91 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Analytics responses only change when the scraper or an admin writes data
+response_cache = ResponseCache(maxsize=RESPONSE_CACHE_SIZE)
+
+def request_data_version(account_scoped=True):
+    """Return (scope, version, maintenance version, last modified) for the current request.
+
+    The scope is the requested account, or DATA_VERSION_ALL when the response depends on every
+    account. Looked up once per request and shared by conditional_get and cached_response.
+    """
+    account = (request.view_args or {}).get('account_name') or request.args.get('account')
+    scope = account if account_scoped and account and account != 'all' else DATA_VERSION_ALL
+    known = g.setdefault('data_versions', {})
+    if scope not in known:
+        versions = db.get_data_versions([scope, DATA_VERSION_MAINTENANCE])
+        version, updated_at = versions[scope]
+        maintenance_version, maintenance_updated_at = versions[DATA_VERSION_MAINTENANCE]
+        last_modified = max([d for d in (updated_at, maintenance_updated_at) if d], default=None)
+        known[scope] = (scope, version, maintenance_version, last_modified)
+    return known[scope]
+
+def request_key():
+    """Normalized identity of the current request: endpoint, path arguments and sorted query parameters"""
+    return (
+        request.endpoint,
+        tuple(sorted((request.view_args or {}).items())),
+        tuple(sorted((k, v.strip()) for k, v in request.args.items(multi=True))),
+        datetime.now().strftime('%Y-%m-%d')  # Handlers default their date ranges to today
+    )
+
+def cached_response(account_scoped=True):
+    """Serve repeated GETs from response_cache until the data version of their account changes.
+
+    With account_scoped=False the response depends on every account, so any write invalidates it.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.args.get('account') == 'Demo Client':
+                return f(*args, **kwargs)  # Demo data is regenerated on every request
+
+            scope, version, maintenance_version, _ = request_data_version(account_scoped)
+            key = request_key() + (scope, version, maintenance_version)
+            cached = response_cache.get(key)
+            if cached is not None:
+                body, status, headers = cached
+                return app.response_class(body, status=status, headers=headers)
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                response_cache.set(key, (response.get_data(), response.status_code, list(response.headers)))
+            return response
+        return decorated_function
+    return decorator
+
+def conditional_get(account_scoped=True):
+    """Add a strong ETag and Last-Modified to GET responses and answer matching If-None-Match with 304.
+
+    The ETag is derived from the request parameters and the data version, so the 304 is
+    returned before the handler runs any query.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method != 'GET' or request.args.get('account') == 'Demo Client':
+                return f(*args, **kwargs)
+
+            scope, version, maintenance_version, last_modified = request_data_version(account_scoped)
+            etag = hashlib.sha1(
+                repr(request_key() + (scope, version, maintenance_version)).encode('utf-8')
+            ).hexdigest()
+
+            if request.if_none_match.contains(etag):
+                response = app.response_class(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified.replace(tzinfo=pytz.utc)
+            response.headers['Cache-Control'] = 'private, no-cache'  # Always revalidate
+            return response
+        return decorated_function
+    return decorator
+
 # Login route
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -245,6 +337,8 @@ def interpolate_missing_days(data, start_date, end_date):
 
 @app.route('/api/partnership-metrics')
 @login_required
+@conditional_get()
+@cached_response()
 def get_partnership_metrics():
     try:
         print("\n\n=== PARTNERSHIP METRICS DEBUG ===")
@@ -261,30 +355,23 @@ def get_partnership_metrics():
             demo_data = db.generate_demo_data()
             
             # Get the most recent demo record
-            latest_record = demo_data[0]  # Most recent due to date ordering
-            earliest_record = demo_data[-1]  # Earliest record
+            latest_record = SnapshotView(demo_data[0])  # Most recent due to date ordering
+            earliest_record = SnapshotView(demo_data[-1])  # Earliest record
             
             print(f"Processing demo data with {len(demo_data)} records")
             
             # Process metrics similar to real data
             metrics = []
-            all_partners = set(
-                [rec['creator'] for rec in latest_record.recommending_me] + 
-                [rec['creator'] for rec in latest_record.my_recommendations]
-            )
+            all_partners = set(latest_record.received_partners()) | set(latest_record.sent_partners())
             
             for partner in all_partners:
                 # Get latest values
-                latest_received = next((int(rec['subscribers']) 
-                    for rec in latest_record.recommending_me if rec['creator'] == partner), 0)
-                latest_sent = next((int(rec['subscribers']) 
-                    for rec in latest_record.my_recommendations if rec['creator'] == partner), 0)
+                latest_received = latest_record.received(partner)
+                latest_sent = latest_record.sent(partner)
                 
                 # Get earliest values
-                earliest_received = next((int(rec['subscribers']) 
-                    for rec in earliest_record.recommending_me if rec['creator'] == partner), 0)
-                earliest_sent = next((int(rec['subscribers']) 
-                    for rec in earliest_record.my_recommendations if rec['creator'] == partner), 0)
+                earliest_received = earliest_record.received(partner)
+                earliest_sent = earliest_record.sent(partner)
                 
                 # Calculate changes
                 period_received = latest_received - earliest_received
@@ -313,125 +400,30 @@ def get_partnership_metrics():
         start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
         end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
         
-        session = db.Session()
-        try:
-            # Base query
-            query = session.query(ReferralData)\
-                .filter(ReferralData.date <= end_date)\
-                .filter(ReferralData.date >= start_date)\
-                .order_by(ReferralData.date)
-
-            # Add account filter only if specific account requested
-            if account and account != 'all':
-                query = query.filter(ReferralData.account_name == account)
-                
-            records = query.all()
-                
-            if not records:
-                return jsonify([])
-            
-            # Group records by account
-            account_records = {}
-            for record in records:
-                if record.account_name not in account_records:
-                    account_records[record.account_name] = []
-                account_records[record.account_name].append(record)
-            
-            results = []
-            all_partners = set()
-            partner_metrics = {}
-            
-            # Process each account's records
-            for acc_records in account_records.values():
-                if len(acc_records) <= 1:
-                    continue
-                    
-                # Find first non-zero record for each partner's sent and received
-                partner_baselines = {}
-                
-                for record in acc_records:
-                    for rec in record.recommending_me:
-                        partner = rec['creator']
-                        if partner not in partner_baselines:
-                            partner_baselines[partner] = {'received': None, 'sent': None}
-                        if partner_baselines[partner]['received'] is None and safe_int_convert(rec['subscribers']) > 0:
-                            partner_baselines[partner]['received'] = {
-                                'value': safe_int_convert(rec['subscribers']),
-                                'date': record.date
-                            }
-                            
-                    for rec in record.my_recommendations:
-                        partner = rec['creator']
-                        if partner not in partner_baselines:
-                            partner_baselines[partner] = {'received': None, 'sent': None}
-                        if partner_baselines[partner]['sent'] is None and safe_int_convert(rec['subscribers']) > 0:
-                            partner_baselines[partner]['sent'] = {
-                                'value': safe_int_convert(rec['subscribers']),
-                                'date': record.date
-                            }
-
-                # Now process the changes using separate baselines
-                period_start = acc_records[0]
-                period_end = acc_records[-1]
-                
-                for partner in partner_baselines:
-                    key = partner if account == 'all' else f"{partner}_{period_start.account_name}"
-                    
-                    if key not in partner_metrics:
-                        partner_metrics[key] = {
-                            'partner': partner,
-                            'account': period_start.account_name if account != 'all' else 'All Clients',
-                            'period_received': 0,
-                            'period_sent': 0,
-                            'latest_received': 0,
-                            'latest_sent': 0,
-                            'baseline_received': partner_baselines[partner]['received'],
-                            'baseline_sent': partner_baselines[partner]['sent']
-                        }
-                    
-                    # Calculate period end values
-                    period_end_received = next((safe_int_convert(rec['subscribers']) 
-                        for rec in period_end.recommending_me if rec['creator'] == partner), 0)
-                    period_end_sent = next((safe_int_convert(rec['subscribers']) 
-                        for rec in period_end.my_recommendations if rec['creator'] == partner), 0)
-                    
-                    # Calculate changes using appropriate baselines
-                    baseline = partner_baselines[partner]
-                    if baseline['received'] and baseline['received']['date'] <= period_end.date:
-                        partner_metrics[key]['period_received'] = period_end_received - baseline['received']['value']
-                    if baseline['sent'] and baseline['sent']['date'] <= period_end.date:
-                        partner_metrics[key]['period_sent'] = period_end_sent - baseline['sent']['value']
-                    
-                    # Store latest values
-                    partner_metrics[key]['latest_received'] = period_end_received
-                    partner_metrics[key]['latest_sent'] = period_end_sent
-
-            # Convert metrics to results
-            for metrics in partner_metrics.values():
-                metrics['period_balance'] = metrics['period_received'] - metrics['period_sent']
-                metrics['all_time_balance'] = metrics['latest_received'] - metrics['latest_sent']
-                results.append(metrics)
-            
-            # Sort by period balance, most negative first
-            results.sort(key=lambda x: x['period_balance'])
-            
-            return jsonify(results)
-            
-        finally:
-            session.close()
+        # Baselines, period deltas and balances are computed on dense arrays
+        results = db.get_partnership_metrics(start_date, end_date, account)
+        return jsonify(results)
             
     except Exception as e:
         print(f"Error in partnership metrics: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/cache-stats')
+@login_required
+def get_cache_stats():
+    return jsonify(response_cache.stats())
+
 @app.route('/api/earliest-date')
 @login_required
+@conditional_get(account_scoped=False)
 def get_earliest_date():
     earliest_date = db.get_earliest_data_date()
     return jsonify({'earliest_date': earliest_date.isoformat() if earliest_date else None})
 
 @app.route('/api/largest-imbalances')
 @login_required
+@conditional_get(account_scoped=False)
+@cached_response(account_scoped=False)
 def get_largest_imbalances():
     try:
         # Get date parameters
@@ -446,50 +438,31 @@ def get_largest_imbalances():
             latest_stats = {}
             
             # Get latest record for all-time stats
-            latest_record = session.query(ReferralData)\
-                .order_by(ReferralData.date.desc())\
-                .first()
+            latest_snapshots = db.get_latest_snapshots()
+            latest_record = latest_snapshots[0] if latest_snapshots else None
             
             if latest_record:
                 for rec in latest_record.recommending_me:
                     creator = rec['creator']
                     if creator not in latest_stats:
                         latest_stats[creator] = {'received': 0, 'sent': 0}
-                    latest_stats[creator]['received'] += safe_int_convert(rec['subscribers'])
+                    latest_stats[creator]['received'] += rec['subscribers']
                 
                 for rec in latest_record.my_recommendations:
                     creator = rec['creator']
                     if creator not in latest_stats:
                         latest_stats[creator] = {'received': 0, 'sent': 0}
-                    latest_stats[creator]['sent'] += safe_int_convert(rec['subscribers'])
+                    latest_stats[creator]['sent'] += rec['subscribers']
             
             # Get period data
             if start_date and end_date:
                 start = datetime.strptime(start_date, '%Y-%m-%d')
                 end = datetime.strptime(end_date, '%Y-%m-%d')
                 
-                # Add account filter if specified
-                query = session.query(ReferralData)\
-                    .filter(ReferralData.date.between(start, end))
-                
-                if account and account != 'all':
-                    query = query.filter(ReferralData.account_name == account)
-                
-                period_records = query.all()
-                
-                # Process all records in period
-                for record in period_records:
-                    for rec in record.recommending_me:
-                        creator = rec['creator']
-                        if creator not in period_stats:
-                            period_stats[creator] = {'received': 0, 'sent': 0}
-                        period_stats[creator]['received'] += safe_int_convert(rec['subscribers'])
-                    
-                    for rec in record.my_recommendations:
-                        creator = rec['creator']
-                        if creator not in period_stats:
-                            period_stats[creator] = {'received': 0, 'sent': 0}
-                        period_stats[creator]['sent'] += safe_int_convert(rec['subscribers'])
+                # Partner totals over every record in the period, summed in the database
+                period_stats = db.get_period_partner_totals(
+                    start, end, account if account and account != 'all' else None
+                )
 
             # Combine results
             results = []
@@ -550,6 +523,7 @@ def debug_db():
 
 @app.route('/api/trends/<account_name>')
 @login_required
+@conditional_get()
 def get_trends(account_name):
     try:
         print("\n=== Starting get_trends ===")
@@ -597,19 +571,19 @@ def get_trends(account_name):
                 if partner:
                     # If partner specified, get specific partner trends
                     received = next(
-                        (int(rec['subscribers']) for rec in record.recommending_me 
+                        (rec['subscribers'] for rec in record.recommending_me 
                          if rec['creator'] == partner), 
                         0
                     )
                     sent = next(
-                        (int(rec['subscribers']) for rec in record.my_recommendations 
+                        (rec['subscribers'] for rec in record.my_recommendations 
                          if rec['creator'] == partner), 
                         0
                     )
                 else:
                     # Otherwise get total trends
-                    received = sum(int(rec['subscribers']) for rec in record.recommending_me)
-                    sent = sum(int(rec['subscribers']) for rec in record.my_recommendations)
+                    received = sum(rec['subscribers'] for rec in record.recommending_me)
+                    sent = sum(rec['subscribers'] for rec in record.my_recommendations)
                 
                 trend_data['trends']['dates'].append(record.date.strftime('%Y-%m-%d'))
                 trend_data['trends']['received'].append(received)
@@ -675,12 +649,14 @@ def get_trends(account_name):
         return jsonify(response_data)
             
     except Exception as e:
+        import traceback
         print(f"Error getting trends: {str(e)}")
         print("Error traceback:", traceback.format_exc())
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/trends/summary')
 @login_required
+@conditional_get(account_scoped=False)
 def get_trends_summary():
     try:
         days = request.args.get('days', default=30, type=int)
@@ -704,68 +680,18 @@ def get_trends_summary():
 @login_required
 def import_csv_data():
     """Import existing CSV data into the database"""
-    session = db.Session()
     try:
-        import pandas as pd
-        
-        # Read the CSV file
-        df = pd.read_csv('src/data/referral_data.csv')
-        
-        # Convert date strings to datetime objects
-        df['date'] = pd.to_datetime(df['date'])
-        
-        # Group by account_name and date
-        records_added = 0
-        for account_name in df['account_name'].unique():
-            account_df = df[df['account_name'] == account_name]
-            
-            for date in account_df['date'].unique():
-                date_df = account_df[account_df['date'] == date]
-                
-                # Get recommending_me data
-                recommending = date_df[date_df['tab'] == 'recommending_me']
-                recommending_list = [
-                    {
-                        'creator': row['creator'],
-                        'subscribers': row['subscribers'],
-                        'conversion_rate': row['conversion_rate']
-                    }
-                    for _, row in recommending.iterrows()
-                ]
-                
-                # Get my_recommendations data
-                recommendations = date_df[date_df['tab'] == 'my_recommendations']
-                recommendations_list = [
-                    {
-                        'creator': row['creator'],
-                        'subscribers': row['subscribers'],
-                        'conversion_rate': row['conversion_rate']
-                    }
-                    for _, row in recommendations.iterrows()
-                ]
-                
-                # Create record
-                record = ReferralData(
-                    date=date,
-                    account_name=account_name,
-                    recommending_me=recommending_list,
-                    my_recommendations=recommendations_list
-                )
-                session.add(record)
-                records_added += 1
-        
-        session.commit()
+        stats = import_csv(db, 'src/data/referral_data.csv')
         return jsonify({
-            "message": f"Successfully imported {records_added} records from CSV",
-            "records_added": records_added
+            "message": f"Successfully imported {stats['snapshots']} records from CSV",
+            "records_added": stats['snapshots'],
+            "rows": stats['rows'],
+            "rows_per_second": stats['rows_per_second']
         })
     
     except Exception as e:
-        session.rollback()
         print(f"Error importing data: {str(e)}")
         return jsonify({"error": str(e)}), 500
-    finally:
-        session.close()
 
 @app.after_request
 def after_request(response):
@@ -778,6 +704,8 @@ def after_request(response):
 
 @app.route('/api/partnership-trends')
 @login_required
+@conditional_get()
+@cached_response()
 def get_partnership_trends():
     try:
         account = request.args.get('account')
@@ -786,177 +714,115 @@ def get_partnership_trends():
         end_date = datetime.strptime(request.args.get('end'), '%Y-%m-%d').replace(hour=23, minute=59, second=59)
         aggregation = request.args.get('aggregation', 'day')  # 'day', 'week', or 'month'
         
-        session = db.Session()
-        try:
-            # Get records within date range
-            records = session.query(ReferralData)\
-                .filter(ReferralData.account_name == account)\
-                .filter(ReferralData.date >= start_date)\
-                .filter(ReferralData.date <= end_date)\
-                .order_by(ReferralData.date)\
-                .all()
-            
-            print(f"\nFound {len(records)} records")
-            
-            # Process subscriber counts and conversion rates
-            dates = []
-            received_values = []
-            sent_values = []
-            conversion_data = []
-            
-            # Group records by aggregation period
-            aggregated_data = {}
-            for record in records:
-                # Get the period key based on aggregation type
-                if aggregation == 'week':
-                    period_key = record.date.strftime('%Y-%W')  # Year-WeekNumber
-                elif aggregation == 'month':
-                    period_key = record.date.strftime('%Y-%m')  # Year-Month
-                else:  # day
-                    period_key = record.date.strftime('%Y-%m-%d')
-                
-                if period_key not in aggregated_data:
-                    aggregated_data[period_key] = {
-                        'date': record.date,
-                        'received': 0,
-                        'sent': 0,
-                        'sent_rate': None,
-                        'received_rate': None,
-                        'has_conversion_data': False
-                    }
-                
-                # Handle received values
-                partner_received = next((rec for rec in record.recommending_me if rec['creator'] == partner), None)
-                received = safe_int_convert(partner_received['subscribers']) if partner_received else 0
-                aggregated_data[period_key]['received'] = max(aggregated_data[period_key]['received'], received)
-
-                # Handle sent values
-                partner_sent = next((rec for rec in record.my_recommendations if rec['creator'] == partner), None)
-                sent = safe_int_convert(partner_sent['subscribers']) if partner_sent else 0
-                aggregated_data[period_key]['sent'] = max(aggregated_data[period_key]['sent'], sent)
-                
-                # Handle conversion rates - take the latest rates in the period
-                if partner_received and 'conversion_rate' in partner_received:
-                    try:
-                        rate_str = str(partner_received['conversion_rate']).replace('%', '').strip()
-                        rate = float(rate_str)
-                        if 0 <= rate <= 100:
-                            aggregated_data[period_key]['received_rate'] = rate / 100
-                            aggregated_data[period_key]['has_conversion_data'] = True
-                    except (ValueError, TypeError) as e:
-                        print(f"Error processing received rate: {e}")
-
-                if partner_sent and 'conversion_rate' in partner_sent:
-                    try:
-                        rate_str = str(partner_sent['conversion_rate']).replace('%', '').strip()
-                        rate = float(rate_str)
-                        if 0 <= rate <= 100:
-                            aggregated_data[period_key]['sent_rate'] = rate / 100
-                            aggregated_data[period_key]['has_conversion_data'] = True
-                    except (ValueError, TypeError) as e:
-                        print(f"Error processing sent rate: {e}")
-
-            # Convert aggregated data to lists
-            sorted_periods = sorted(aggregated_data.items())
-            for period_key, data in sorted_periods:
-                # Format display date based on aggregation
-                if aggregation == 'week':
-                    display_date = data['date'].strftime('Week %W, %Y')
-                elif aggregation == 'month':
-                    display_date = data['date'].strftime('%b %Y')
-                else:
-                    display_date = data['date'].strftime('%Y-%m-%d')
-                
-                dates.append(display_date)
-                received_values.append(data['received'])
-                sent_values.append(data['sent'])
-                
-                if data['has_conversion_data']:
-                    conversion_data.append({
-                        'date': display_date,
-                        'sent_rate': data['sent_rate'],
-                        'received_rate': data['received_rate']
-                    })
+        # Per-period partner values come from the day/week/month rollups
+        grain = aggregation if aggregation in ('week', 'month') else 'day'
+        if grain == 'day' and db.materialize_daily_series:
+            # Dense series with missing days already interpolated
+            periods = db.get_daily_series(account, partner, start_date, end_date)
+        else:
+            periods = db.get_rollup_periods(account, grain, start_date, end_date, partner=partner)
+        
+        print(f"\nFound {len(periods)} {aggregation} periods")
+        
+        # Process subscriber counts and conversion rates
+        dates = []
+        received_values = []
+        sent_values = []
+        conversion_data = []
+        
+        for data in periods:
+            # Format display date based on aggregation
+            if aggregation == 'week':
+                display_date = data['date'].strftime('Week %W, %Y')
+            elif aggregation == 'month':
+                display_date = data['date'].strftime('%b %Y')
+            else:
+                display_date = data['date'].strftime('%Y-%m-%d')
+            
+            dates.append(display_date)
+            received_values.append(data['received'])
+            sent_values.append(data['sent'])
+            
+            # Rollups keep the latest valid rates in the period, as percentages
+            if data['received_rate'] is not None or data['sent_rate'] is not None:
+                conversion_data.append({
+                    'date': display_date,
+                    'sent_rate': data['sent_rate'] / 100 if data['sent_rate'] is not None else None,
+                    'received_rate': data['received_rate'] / 100 if data['received_rate'] is not None else None
+                })
 
-            # Sort conversion data by date
-            conversion_data.sort(key=lambda x: x['date'])
-            
-            print(f"\nCollected {len(conversion_data)} conversion rate data points:")
-            for data in conversion_data:
-                print(f"Date: {data['date']}")
-                print(f"  Sent rate: {data['sent_rate']*100 if data['sent_rate'] is not None else 'None'}%")
-                print(f"  Received rate: {data['received_rate']*100 if data['received_rate'] is not None else 'None'}%")
-
-            # Find baselines
-            baseline_received = None
-            baseline_sent = None
-            baseline_received_date = None
-            baseline_sent_date = None
-            
-            for record in records:
-                # Find first non-zero values for baselines
-                for rec in record.recommending_me:
-                    if rec['creator'] == partner:
-                        received = safe_int_convert(rec.get('subscribers', 0))
-                        if received > 0 and baseline_received is None:
-                            baseline_received = received
-                            baseline_received_date = record.date
-                        break
-                
-                for rec in record.my_recommendations:
-                    if rec['creator'] == partner:
-                        sent = safe_int_convert(rec.get('subscribers', 0))
-                        if sent > 0 and baseline_sent is None:
-                            baseline_sent = sent
-                            baseline_sent_date = record.date
-                        break
-
-            # Calculate current period metrics
-            current_received = received_values[-1] - (baseline_received or 0) if received_values else 0
-            current_sent = sent_values[-1] - (baseline_sent or 0) if sent_values else 0
-            
-            # Get the latest valid conversion rates
-            latest_sent_rate = next((d['sent_rate'] for d in reversed(conversion_data) if d['sent_rate'] is not None), None)
-            latest_received_rate = next((d['received_rate'] for d in reversed(conversion_data) if d['received_rate'] is not None), None)
-
-            response_data = {
-                'historical_data': {
-                    'dates': dates,
-                    'received': received_values,
-                    'sent': sent_values,
-                    'conversion_dates': [d['date'] for d in conversion_data],
-                    'sent_conversion_rates': [d['sent_rate'] for d in conversion_data],
-                    'received_conversion_rates': [d['received_rate'] for d in conversion_data],
-                    'aggregation': aggregation
-                },
-                'current_period': {
-                    'received': current_received,
-                    'sent': current_sent,
-                    'balance': current_received - current_sent,
-                    'sent_conversion_rate': latest_sent_rate,
-                    'received_conversion_rate': latest_received_rate
+        # Sort conversion data by date
+        conversion_data.sort(key=lambda x: x['date'])
+        
+        print(f"\nCollected {len(conversion_data)} conversion rate data points:")
+        for data in conversion_data:
+            print(f"Date: {data['date']}")
+            print(f"  Sent rate: {data['sent_rate']*100 if data['sent_rate'] is not None else 'None'}%")
+            print(f"  Received rate: {data['received_rate']*100 if data['received_rate'] is not None else 'None'}%")
+
+        # Find baselines
+        baseline_received = None
+        baseline_sent = None
+        baseline_received_date = None
+        baseline_sent_date = None
+        
+        for entry in db.get_partner_history(account, partner, start_date, end_date):
+            # Find first non-zero values for baselines
+            if entry['received'] > 0 and baseline_received is None:
+                baseline_received = entry['received']
+                baseline_received_date = entry['date']
+            if entry['sent'] > 0 and baseline_sent is None:
+                baseline_sent = entry['sent']
+                baseline_sent_date = entry['date']
+            if baseline_received is not None and baseline_sent is not None:
+                break
+
+        # Calculate current period metrics
+        current_received = received_values[-1] - (baseline_received or 0) if received_values else 0
+        current_sent = sent_values[-1] - (baseline_sent or 0) if sent_values else 0
+        
+        # Get the latest valid conversion rates
+        latest_sent_rate = next((d['sent_rate'] for d in reversed(conversion_data) if d['sent_rate'] is not None), None)
+        latest_received_rate = next((d['received_rate'] for d in reversed(conversion_data) if d['received_rate'] is not None), None)
+
+        response_data = {
+            'historical_data': {
+                'dates': dates,
+                'received': received_values,
+                'sent': sent_values,
+                'conversion_dates': [d['date'] for d in conversion_data],
+                'sent_conversion_rates': [d['sent_rate'] for d in conversion_data],
+                'received_conversion_rates': [d['received_rate'] for d in conversion_data],
+                'aggregation': aggregation
+            },
+            'current_period': {
+                'received': current_received,
+                'sent': current_sent,
+                'balance': current_received - current_sent,
+                'sent_conversion_rate': latest_sent_rate,
+                'received_conversion_rate': latest_received_rate
+            },
+            'baselines': {
+                'received': {
+                    'value': baseline_received,
+                    'date': baseline_received_date.strftime('%Y-%m-%d') if baseline_received_date else None
                 },
-                'baselines': {
-                    'received': {
-                        'value': baseline_received,
-                        'date': baseline_received_date.strftime('%Y-%m-%d') if baseline_received_date else None
-                    },
-                    'sent': {
-                        'value': baseline_sent,
-                        'date': baseline_sent_date.strftime('%Y-%m-%d') if baseline_sent_date else None
-                    }
+                'sent': {
+                    'value': baseline_sent,
+                    'date': baseline_sent_date.strftime('%Y-%m-%d') if baseline_sent_date else None
                 }
             }
+        }
 
-            print("\nResponse data:")
-            print(f"Conversion dates: {response_data['historical_data']['conversion_dates']}")
-            print(f"Sent rates: {response_data['historical_data']['sent_conversion_rates']}")
-            print(f"Received rates: {response_data['historical_data']['received_conversion_rates']}")
+        if periods and 'interpolated' in periods[0]:
+            response_data['historical_data']['interpolated'] = [data['interpolated'] for data in periods]
 
-            return jsonify(response_data)
-            
-        finally:
-            session.close()
+        print("\nResponse data:")
+        print(f"Conversion dates: {response_data['historical_data']['conversion_dates']}")
+        print(f"Sent rates: {response_data['historical_data']['sent_conversion_rates']}")
+        print(f"Received rates: {response_data['historical_data']['received_conversion_rates']}")
+
+        return jsonify(response_data)
             
     except Exception as e:
         print(f"Error processing partnership trends: {str(e)}")
@@ -1227,7 +1093,12 @@ def database_admin():
                 }
 
                 async function cleanupDuplicates() {
-                    if (confirm('This will remove duplicate entries for the same day. Continue?')) {
+                    const preview = await (await fetch('/admin/cleanup-duplicates?dry_run=true', { method: 'POST' })).json();
+                    if (!preview.success) {
+                        alert('Error: ' + preview.error);
+                        return;
+                    }
+                    if (confirm(`This will remove ${preview.duplicates_found} duplicate entries for the same day. Continue?`)) {
                         try {
                             const response = await fetch('/admin/cleanup-duplicates', {
                                 method: 'POST'
@@ -1351,7 +1222,12 @@ def database_admin():
                 }
 
                 async function cleanupInitialData() {
-                    if (confirm('This will remove records where we only have partial data for specific partners. Continue?')) {
+                    const preview = await (await fetch('/admin/cleanup-initial-data?dry_run=true', { method: 'POST' })).json();
+                    if (!preview.success) {
+                        alert('Error: ' + preview.error);
+                        return;
+                    }
+                    if (confirm(`This will remove ${preview.records_found} records where we only have partial data for specific partners. Continue?`)) {
                         try {
                             const response = await fetch('/admin/cleanup-initial-data', {
                                 method: 'POST'
@@ -1474,7 +1350,7 @@ def delete_record(record_id):
     try:
         record = session.query(ReferralData).get(record_id)
         if record:
-            session.delete(record)
+            db.delete_records(session, [record.id])
             session.commit()
             return jsonify({'success': True})
         return jsonify({'success': False, 'error': 'Record not found'})
@@ -1489,7 +1365,7 @@ def delete_record(record_id):
 def clear_database():
     session = db.Session()
     try:
-        count = session.query(ReferralData).delete()
+        count = db.delete_records(session)
         session.commit()
         return jsonify({
             'success': True,
@@ -1500,6 +1376,7 @@ def clear_database():
 
 @app.route('/api/debug/database')
 @login_required
+@conditional_get(account_scoped=False)
 def debug_database():
     session = db.Session()
     try:
@@ -1599,38 +1476,18 @@ def get_last_scrape_time():
 @app.route('/admin/cleanup-duplicates', methods=['POST'])
 @login_required
 def cleanup_duplicates():
-    session = db.Session()
+    """Keep the latest entry for each day and account; ?dry_run=true only counts the duplicates"""
     try:
-        # Get all records ordered by date and account
-        records = session.query(ReferralData)\
-            .order_by(ReferralData.date.desc(), ReferralData.account_name)\
-            .all()
-        
-        # Group by date and account
-        seen = set()
-        duplicates = []
-        for record in records:
-            # Create a key for each day (strip time) and account
-            key = (record.date.strftime('%Y-%m-%d'), record.account_name)
-            if key in seen:
-                duplicates.append(record)
-            else:
-                seen.add(key)
-        
-        # Delete duplicates (keep the latest entry for each day)
-        for record in duplicates:
-            session.delete(record)
-        
-        session.commit()
+        dry_run = request.args.get('dry_run', 'false').lower() == 'true'
+        result = delete_snapshots(db, duplicate_snapshots(), dry_run=dry_run, label='Duplicate cleanup')
         return jsonify({
             'success': True,
-            'duplicates_removed': len(duplicates)
+            'dry_run': dry_run,
+            'duplicates_found': result['candidates'],
+            'duplicates_removed': result['deleted']
         })
     except Exception as e:
-        session.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        session.close()
 
 @app.route('/admin/bulk-delete', methods=['POST'])
 @login_required
@@ -1641,9 +1498,7 @@ def bulk_delete_records():
         
         session = db.Session()
         try:
-            deleted_count = session.query(ReferralData)\
-                .filter(ReferralData.id.in_(record_ids))\
-                .delete(synchronize_session=False)
+            deleted_count = db.delete_records(session, record_ids)
             session.commit()
             
             return jsonify({
@@ -1658,86 +1513,42 @@ def bulk_delete_records():
 
 @app.route('/api/daily-changes')
 @login_required
+@conditional_get()
+@cached_response()
 def get_daily_changes():
     try:
-        # Add cache control headers
-        response = make_response()
-        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-        response.headers['Pragma'] = 'no-cache'
-        response.headers['Expires'] = '0'
-        
         account = request.args.get('account')
         partner = request.args.get('partner')
         start_date = datetime.strptime(request.args.get('start'), '%Y-%m-%d')
         end_date = datetime.strptime(request.args.get('end'), '%Y-%m-%d').replace(hour=23, minute=59, second=59)
         
-        session = db.Session()
-        try:
-            records = session.query(ReferralData)\
-                .filter(ReferralData.account_name == account)\
-                .filter(ReferralData.date >= start_date)\
-                .filter(ReferralData.date <= end_date)\
-                .order_by(ReferralData.date)\
-                .all()
-            
-            # Get the baseline values (first non-zero values)
-            baseline_sent = None
-            baseline_received = None
-            baseline_sent_date = None
-            baseline_received_date = None
-            
-            for record in records:
-                sent = next((safe_int_convert(rec['subscribers']) 
-                    for rec in record.my_recommendations if rec['creator'] == partner), 0)
-                received = next((safe_int_convert(rec['subscribers']) 
-                    for rec in record.recommending_me if rec['creator'] == partner), 0)
-                
-                if sent > 0 and baseline_sent is None:
-                    baseline_sent = sent
-                    baseline_sent_date = record.date
-                if received > 0 and baseline_received is None:
-                    baseline_received = received
-                    baseline_received_date = record.date
-            
-            # Calculate daily changes
-            changes = []
-            for i in range(1, len(records)):
-                prev = records[i-1]
-                curr = records[i]
-                
-                sent_change = 0
-                received_change = 0
-                
-                # Get current and previous values
-                curr_sent = next((safe_int_convert(rec['subscribers']) 
-                    for rec in curr.my_recommendations if rec['creator'] == partner), 0)
-                prev_sent = next((safe_int_convert(rec['subscribers']) 
-                    for rec in prev.my_recommendations if rec['creator'] == partner), 0)
-                    
-                curr_received = next((safe_int_convert(rec['subscribers']) 
-                    for rec in curr.recommending_me if rec['creator'] == partner), 0)
-                prev_received = next((safe_int_convert(rec['subscribers']) 
-                    for rec in prev.recommending_me if rec['creator'] == partner), 0)
-                
-                # Only calculate change if previous value was non-zero
-                # This skips the first appearance of data
-                if prev_sent > 0:
-                    sent_change = curr_sent - prev_sent
-                if prev_received > 0:
-                    received_change = curr_received - prev_received
-                
-                changes.append({
-                    'date': curr.date.strftime('%-m/%-d'),
-                    'sent': sent_change,
-                    'received': received_change
-                })
-            
-            return jsonify({
-                'daily_changes': changes
+        history = db.get_partner_history(account, partner, start_date, end_date)
+        
+        # Calculate daily changes
+        changes = []
+        for i in range(1, len(history)):
+            prev = history[i-1]
+            curr = history[i]
+            
+            sent_change = 0
+            received_change = 0
+            
+            # Only calculate change if previous value was non-zero
+            # This skips the first appearance of data
+            if prev['sent'] > 0:
+                sent_change = curr['sent'] - prev['sent']
+            if prev['received'] > 0:
+                received_change = curr['received'] - prev['received']
+            
+            changes.append({
+                'date': curr['date'].strftime('%-m/%-d'),
+                'sent': sent_change,
+                'received': received_change
             })
-            
-        finally:
-            session.close()
+        
+        return jsonify({
+            'daily_changes': changes
+        })
             
     except Exception as e:
         print(f"Error calculating daily changes: {str(e)}")
@@ -1748,61 +1559,21 @@ def get_daily_changes():
 @app.route('/admin/cleanup-initial-data', methods=['POST'])
 @login_required
 def cleanup_initial_data():
-    session = db.Session()
+    """Remove records with partial data for specific partners; ?dry_run=true only counts them"""
     try:
-        deleted_count = 0
-        
-        print("\nChecking Dan Murray-Serter records...")
-        # Handle Dan Murray-Serter (before Dec 2)
-        records = session.query(ReferralData)\
-            .filter(ReferralData.account_name == 'Chris Donnelly')\
-            .filter(ReferralData.date < datetime(2024, 12, 2))\
-            .all()
-            
-        print(f"Found {len(records)} records before Dec 2")
-        for record in records:
-            print(f"Checking record from {record.date}")
-            dan_recs = [rec for rec in record.recommending_me if rec['creator'] == 'Dan Murray-Serter']
-            if dan_recs:
-                print(f"Found Dan Murray-Serter recommendation: {dan_recs}")
-                session.delete(record)
-                deleted_count += 1
-        
-        print("\nChecking Benchmark records...")
-        # Handle Benchmark (Dec 2 only)
-        records = session.query(ReferralData)\
-            .filter(ReferralData.account_name == 'Chris Donnelly')\
-            .filter(ReferralData.date >= datetime(2024, 12, 2))\
-            .filter(ReferralData.date < datetime(2024, 12, 3))\
-            .all()
-            
-        print(f"Found {len(records)} records on Dec 2")
-        for record in records:
-            print(f"Checking record from {record.date}")
-            print("My recommendations:", record.my_recommendations)
-            print("Recommending me:", record.recommending_me)
-            
-            # Delete if we have Benchmark in either list
-            if any(rec['creator'] == 'Benchmark' for rec in record.recommending_me) or \
-               any(rec['creator'] == 'Benchmark' for rec in record.my_recommendations):
-                print("Found Benchmark data - deleting record")
-                session.delete(record)
-                deleted_count += 1
-        
-        session.commit()
-        print(f"\nTotal records deleted: {deleted_count}")
-        
+        dry_run = request.args.get('dry_run', 'false').lower() == 'true'
+        result = delete_snapshots(db, initial_data_snapshots(db), dry_run=dry_run, label='Initial data cleanup')
         return jsonify({
             'success': True,
-            'records_removed': deleted_count
+            'dry_run': dry_run,
+            'records_found': result['candidates'],
+            'records_removed': result['deleted']
         })
     except Exception as e:
-        session.rollback()
         print(f"Error: {str(e)}")
+        import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
-    finally:
-        session.close()
 
 @app.route('/data/<path:filename>')
 @login_required
@@ -1818,6 +1589,7 @@ def serve_static(filename):
 
 @app.route('/api/debug/record/<date>')
 @login_required
+@conditional_get(account_scoped=False)
 def debug_record(date):
     session = db.Session()
     try:
@@ -1955,9 +1727,8 @@ def record_detail(record_id):
 def import_data():
     if request.method == 'GET':
         # Get list of unique account names from database
-        db = DatabaseManager()
         session = db.Session()
-        accounts = session.query(ReferralData.account_name).distinct().all()
+        accounts = session.query(LatestSnapshot.account_name).all()
         account_list = [account[0] for account in accounts]
         session.close()
 
@@ -2046,90 +1817,16 @@ def import_data():
             account_name = request.form.get('account_name')
             date = request.form.get('date')
             
-            print("1. Received data:")
-            print(f"Account: {account_name}")
-            print(f"Date: {date}")
-            print("CSV sample:", csv_data[:200])
-            
-            import pandas as pd
+            print(f"Importing pasted CSV for account: {account_name}, date: {date}")
             from io import StringIO
             
-            # Read CSV with explicit column names
-            df = pd.read_csv(StringIO(csv_data), names=[
-                'date',
-                'account_name',
-                'tab',
-                'creator',
-                'subscribers',
-                'conversion_rate'
-            ])
-            
-            print("\n2. DataFrame head:")
-            print(df.head())
-            
-            # Clean up the data
-            df['subscribers'] = df['subscribers'].str.replace(',', '')
-            df['conversion_rate'] = df['conversion_rate'].str.rstrip('%')
-            
-            # Filter by account and date
-            if account_name:
-                df = df[df['account_name'].str.strip() == account_name.strip()]
-            if date:
-                df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
-                filter_date = pd.to_datetime(date).strftime('%Y-%m-%d')
-                df = df[df['date'] == filter_date]
-            
-            print("\n3. After filtering:")
-            print(df.head())
-            print(f"Filtered rows: {len(df)}")
-            
-            if len(df) == 0:
+            # Pasted rows have no header; filter by account and day while importing
+            stats = import_csv(db, StringIO(csv_data), header=False, account_name=account_name, day=date)
+            if not stats['snapshots']:
                 return 'No matching data found to import'
             
-            # Group and format for database
-            records = []
-            for (date, account), group in df.groupby(['date', 'account_name']):
-                recommending_me = []
-                my_recommendations = []
-                
-                for _, row in group.iterrows():
-                    entry = {
-                        'creator': row['creator'],
-                        'subscribers': int(float(row['subscribers'])),
-                        'conversion_rate': float(row['conversion_rate'])
-                    }
-                    if row['tab'] == 'recommending_me':
-                        recommending_me.append(entry)
-                    else:
-                        my_recommendations.append(entry)
-                
-                records.append({
-                    'date': date,
-                    'account_name': account,
-                    'recommending_me': recommending_me,
-                    'my_recommendations': my_recommendations
-                })
-            
-            print("\n4. Final records:")
-            print(records)
-            
-            # Save to database
-            db = DatabaseManager()
-            session = db.Session()
-            
-            for record in records:
-                data = ReferralData(
-                    date=pd.to_datetime(record['date']),
-                    account_name=record['account_name'],
-                    recommending_me=record['recommending_me'],
-                    my_recommendations=record['my_recommendations']
-                )
-                session.add(data)
-            
-            session.commit()
-            session.close()
-            
-            return f'Successfully imported {len(records)} records!'
+            return (f"Successfully imported {stats['snapshots']} records! "
+                    f"({stats['rows']} rows, {stats['rows_per_second']} rows/sec)")
             
         except Exception as e:
             print(f"Error occurred: {str(e)}")
@@ -2156,17 +1853,15 @@ def process_partnership_records(records, partner):
     received_values = []
     sent_values = []
     
-    for record in records:
+    for record in map(SnapshotView, records):
         dates.append(record.date.strftime('%-m/%-d'))
         
         # Handle received values
-        received = next((r['subscribers'] for r in record.recommending_me 
-                       if r['creator'] == partner), 0)
+        received = record.received(partner)
         received_values.append(received)
         
         # Handle sent values
-        sent = next((r['subscribers'] for r in record.my_recommendations 
-                       if r['creator'] == partner), 0)
+        sent = record.sent(partner)
         sent_values.append(sent)
         
         # Debug log each data point
@@ -2194,21 +1889,21 @@ def process_partnership_records(records, partner):
 # Add the new debug endpoint
 @app.route('/api/debug/creator-science')
 @login_required
+@conditional_get(account_scoped=False)
 def debug_creator_science():
     try:
         session = db.Session()
         try:
             # Get all records with Creator Science data
             records = session.query(ReferralData)\
+                .filter(db.partner_filter('Creator Science'))\
                 .order_by(ReferralData.date)\
                 .all()
             
             creator_science_data = []
-            for record in records:
-                sent = next((rec for rec in record.my_recommendations 
-                    if rec['creator'] == 'Creator Science'), None)
-                received = next((rec for rec in record.recommending_me 
-                    if rec['creator'] == 'Creator Science'), None)
+            for record in map(SnapshotView, records):
+                sent = record.sent_entry('Creator Science')
+                received = record.received_entry('Creator Science')
                 
                 if sent or received:
                     creator_science_data.append({
@@ -2245,7 +1940,7 @@ def fix_nathan_barry_dec6():
                 .first()
             
             if record:
-                session.delete(record)
+                db.delete_records(session, [record.id])
                 session.commit()
                 return jsonify({
                     'success': True,
@@ -2266,6 +1961,7 @@ def fix_nathan_barry_dec6():
 
 @app.route('/api/partnership-recommendations', methods=['GET'])
 @login_required
+@conditional_get(account_scoped=False)
 def get_partnership_recommendations():
     try:
         account = request.args.get('account')
@@ -2322,188 +2018,36 @@ def get_partnership_recommendations():
             })
 
         # Continue with existing code for real clients...
-        # Calculate date range for last 30 days
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=30)
-
-        session = db.Session()
-        try:
-            # Get all records for the account in the date range
-            records = session.query(ReferralData)\
-                .filter(ReferralData.account_name == account)\
-                .filter(ReferralData.date.between(start_date, end_date))\
-                .order_by(ReferralData.date.desc())\
-                .all()
-
-            print(f"\nFound {len(records)} records for {account}")
-            print(f"Date range: {start_date} to {end_date}")
+        # Rankings are precomputed after each scrape; fall back to computing them when outdated
+        response_data = db.get_stored_recommendations(account)
+        if response_data is None:
+            print("No current stored recommendations - computing from the last 30 days")
+            end_date = datetime.now()
+            start_date = end_date - timedelta(days=RECOMMENDATION_WINDOW_DAYS)
 
-            # Get the most recent record to find top 3 partners by sent volume
-            if records:
-                latest_record = records[0]
-                earliest_record = records[-1]  # Last record is earliest due to desc order
-                
-                print(f"\nLatest record date: {latest_record.date}")
-                print(f"Earliest record date: {earliest_record.date}")
-                
-                print("\nLatest record my_recommendations:")
-                for rec in latest_record.my_recommendations:
-                    print(f"  {rec['creator']}: {rec.get('subscribers', 0)}")
-                
-                print("\nEarliest record my_recommendations:")
-                for rec in earliest_record.my_recommendations:
-                    print(f"  {rec['creator']}: {rec.get('subscribers', 0)}")
-                
-                # Get sent values for each partner by calculating period changes
-                partner_sent_values = {}
-                print("\n=== DETAILED CALCULATION DEBUG ===")
-                print("Getting sent values for each partner...")
-                
-                for partner in set(rec['creator'] for rec in latest_record.my_recommendations):
-                    # Get values from earliest and latest records
-                    earliest_sent = next((safe_int_convert(rec.get('subscribers', 0))
-                        for rec in earliest_record.my_recommendations if rec['creator'] == partner), 0)
-                    latest_sent = next((safe_int_convert(rec.get('subscribers', 0))
-                        for rec in latest_record.my_recommendations if rec['creator'] == partner), 0)
-                    
-                    # Calculate period change
-                    period_sent = latest_sent - earliest_sent
-                    print(f"\nPartner: {partner}")
-                    print(f"  Latest sent: {latest_sent}")
-                    print(f"  Earliest sent: {earliest_sent}")
-                    print(f"  Period change: {period_sent}")
-                    
-                    if period_sent > 0:  # Only include positive period changes
-                        partner_sent_values[partner] = period_sent
-                        print(f"  ✓ Added to calculation (positive change)")
-                    else:
-                        print(f"  ✗ Excluded from calculation (zero or negative change)")
-
-                print("\nAll collected values before sorting:")
-                for partner, value in partner_sent_values.items():
-                    print(f"  {partner}: {value}")
-
-                # Sort by sent volume and get top 3
-                sorted_partners = sorted(
-                    partner_sent_values.items(),
-                    key=lambda x: x[1],
-                    reverse=True
-                )[:3]
-
-                print("\nTop 3 partners after sorting:")
-                for partner, value in sorted_partners:
-                    print(f"  {partner}: {value}")
-
-                # Calculate average from top 3 sent values
-                sent_volumes = [sent for _, sent in sorted_partners]
-                raw_avg = sum(sent_volumes) / len(sent_volumes) if sent_volumes else 0
-                
-                print("\nFinal calculation:")
-                print(f"Sum of top 3: {sum(sent_volumes)}")
-                print(f"Number of values: {len(sent_volumes)}")
-                print(f"Raw average: {raw_avg}")
-                print(f"Rounded average: {round(raw_avg)}")
-                print("=== END DEBUG ===\n")
-
-                # Calculate volume range (±25%)
-                min_volume = raw_avg * 0.75
-                max_volume = raw_avg * 1.25
-                print(f"Looking for partners between {min_volume} and {max_volume} referrals/month")
-
-                # Get all records from other accounts in the date range
+            session = db.Session()
+            try:
+                records = session.query(ReferralData)\
+                    .filter(ReferralData.account_name == account)\
+                    .filter(ReferralData.date.between(start_date, end_date))\
+                    .order_by(ReferralData.date.desc())\
+                    .all()
                 other_records = session.query(ReferralData)\
                     .filter(ReferralData.account_name != account)\
                     .filter(ReferralData.date.between(start_date, end_date))\
                     .order_by(ReferralData.date.desc())\
                     .all()
+            finally:
+                session.close()
 
-                # Calculate potential partner volumes
-                potential_volumes = {}
-                for record in other_records:
-                    # Track individual creators - look at what they RECEIVE
-                    for rec in record.recommending_me:
-                        partner = rec['creator']
-                        received = safe_int_convert(rec['subscribers'])
-                        if received > 0:  # Only track non-zero volumes
-                            potential_volumes[partner] = {
-                                'volume': max(potential_volumes.get(partner, {}).get('volume', 0), received),
-                                'type': 'creator',
-                                'client': record.account_name
-                            }
-                    
-                    # Track client accounts - look at what they SEND
-                    sent_volumes = [
-                        safe_int_convert(rec['subscribers']) 
-                        for rec in record.my_recommendations 
-                        if safe_int_convert(rec['subscribers']) > 0  # Only count non-zero recommendations
-                    ]
-                    
-                    if sent_volumes:  # Only include if they have valid sent recommendations
-                        total_sent = sum(sent_volumes)
-                        if total_sent > 0:
-                            potential_volumes[record.account_name] = {
-                                'volume': max(potential_volumes.get(record.account_name, {}).get('volume', 0), total_sent),
-                                'type': 'client',
-                                'active_partnerships': len(sent_volumes)
-                            }
-
-                print(f"Potential volumes: {potential_volumes}")
-
-                # Filter for partners within volume range
-                matching_partners = {
-                    partner: data 
-                    for partner, data in potential_volumes.items()
-                    if min_volume <= data['volume'] <= max_volume
-                }
-                print(f"Matching partners before exclusion: {matching_partners}")
-
-                # Exclude current partners and self
-                current_partners = {p['creator'] for p in latest_record.my_recommendations} if records else set()
-                current_partners.add(account)
-                matching_partners = {
-                    partner: data 
-                    for partner, data in matching_partners.items()
-                    if partner not in current_partners
-                }
-                print(f"Final matching partners: {matching_partners}")
-
-                # Get recommendations
-                recommendations = []
-                for partner, data in sorted(matching_partners.items(), key=lambda x: x[1]['volume'], reverse=True)[:10]:
-                    # Find partner's current partnerships
-                    partner_partnerships = set()
-                    for record in other_records:
-                        if data['type'] == 'creator':
-                            if any(rec['creator'] == partner for rec in record.recommending_me):
-                                partner_partnerships.add(record.account_name)
-                        else:  # client type
-                            if record.account_name == partner:
-                                partner_partnerships.update(rec['creator'] for rec in record.recommending_me)
-
-                    recommendations.append({
-                    'partner': partner,
-                        'monthly_volume': data['volume'],
-                        'current_partnerships': list(partner_partnerships),
-                        'volume_match': f"{data['volume']:,} referrals/month (±25% of your volume)",
-                        'example_partnership': next(iter(partner_partnerships)) if partner_partnerships else None,
-                        'type': data['type'],
-                        'client': data.get('client') if data['type'] == 'creator' else None
-                    })
-
-                response_data = {
-                    'recommendations': recommendations,
-                    'metrics': {
-                        'your_avg_volume': round(raw_avg),  # Round the raw average for display
-                        'top_partners': [p for p, _ in sorted_partners] if records else []
-                    }
-                }
-                print(f"Response data: {response_data}")
-                print("=== End Debug ===\n")
+            print(f"\nFound {len(records)} records for {account}")
+            response_data = build_recommendations(account, records, other_records) or {
+                'recommendations': [],
+                'metrics': {'your_avg_volume': 0, 'top_partners': []}
+            }
 
-                return jsonify(response_data)
-            
-        finally:
-            session.close()
+        print(f"Returning {len(response_data['recommendations'])} recommendations")
+        return jsonify(response_data)
             
     except Exception as e:
         print(f"Error generating recommendations: {str(e)}")
@@ -2511,6 +2055,47 @@ def get_partnership_recommendations():
         traceback.print_exc()
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/partner-accounts')
+@login_required
+@conditional_get(account_scoped=False)
+def get_partner_accounts():
+    """Which clients already partner with a creator, from the latest snapshots"""
+    try:
+        partner = request.args.get('partner')
+        graph = db.get_partner_graph()
+        return jsonify({
+            'partner': partner,
+            # partner appears in the client's "Recommending me" list
+            'recommends': [{'account': a, 'subscribers': v} for a, v in graph.accounts_for(partner, 'received')],
+            # partner appears in the client's "My Recommendations" list
+            'recommended_by': [{'account': a, 'subscribers': v} for a, v in graph.accounts_for(partner, 'sent')]
+        })
+    except Exception as e:
+        print(f"Error getting partner accounts: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/partners-by-volume')
+@login_required
+@conditional_get(account_scoped=False)
+def get_partners_by_volume():
+    """Partners whose monthly volume over the last 30 days falls within [min, max]"""
+    try:
+        low = request.args.get('min', default=0, type=float)
+        high = request.args.get('max', default=float('inf'), type=float)
+        kind = request.args.get('type')  # 'creator', 'client' or None for both
+        exclude = set(request.args.getlist('exclude'))
+
+        matches = db.get_volume_index().find_partners_in_volume_band(low, high, exclude=exclude, kind=kind)
+        return jsonify([{
+            'partner': name,
+            'monthly_volume': data['volume'],
+            'type': data['type'],
+            'client': data.get('client')
+        } for name, data in matches])
+    except Exception as e:
+        print(f"Error finding partners by volume: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/demo-data')
 @login_required
 def get_demo_data():
@@ -2545,9 +2130,7 @@ def get_available_accounts():
                 .all()
             
             # Get accounts that have data
-            db_accounts = session.query(ReferralData.account_name)\
-                .distinct()\
-                .all()
+            db_accounts = session.query(LatestSnapshot.account_name).all()
             db_accounts = [account[0] for account in db_accounts]
             
             # Add Demo Client if not present
@@ -2579,6 +2162,7 @@ def get_available_accounts():
 
 @app.route('/api/debug/trends/<account_name>')
 @login_required
+@conditional_get()
 def debug_trends(account_name):
     try:
         days = request.args.get('days', default=30, type=int)
@@ -73,6 +73,21 @@ def hourly_retry():
         logger.info(f"Running retry scrape at {datetime.now()}")
         scraper_scheduler.run_scraper()
 
+@scheduler.scheduled_job('interval', minutes=15)
+def ingest_sync():
+    """Drain the local ingest buffer after network failures (only with BUFFER_INGEST)"""
+    scraper_scheduler.sync_ingest_buffer()
+
+@scheduler.scheduled_job('cron', day_of_week='sun', hour=3, minute=0)
+def weekly_compaction():
+    """Drop intraday duplicate snapshots from old history, outside scraping hours"""
+    scraper_scheduler.compact_snapshots()
+
+@scheduler.scheduled_job('cron', day=1, hour=5, minute=0)
+def monthly_partitions():
+    """Create next months' partitions ahead of the first scrape of the month (PostgreSQL only)"""
+    scraper_scheduler.ensure_partitions()
+
 if __name__ == '__main__':
     log_startup_info()
     logger.info("Starting scheduler...")
@@ -0,0 +1,106 @@
+import time
+import numpy as np
+import pandas as pd
+from ..utils.config import CSV_IMPORT_BATCH_SIZE, CSV_IMPORT_CHUNK_ROWS
+
+# Layout of referral_data.csv, as written by ConvertKitScraper.save_referral_data
+CSV_COLUMNS = ['date', 'account_name', 'tab', 'creator', 'subscribers', 'conversion_rate']
+CSV_DTYPES = {column: str for column in CSV_COLUMNS}
+
+def read_csv_chunks(source, chunk_rows=CSV_IMPORT_CHUNK_ROWS, header=True):
+    """DataFrames of chunk_rows rows each, every column read as text; header=False for pasted rows"""
+    return pd.read_csv(source, names=CSV_COLUMNS, header=0 if header else None, dtype=CSV_DTYPES,
+                       chunksize=chunk_rows)
+
+def snapshots_from_frame(df):
+    """One snapshot dict per (account_name, date) of CSV rows, entries in file order.
+
+    Rows are grouped with a single groupby and distributed to their snapshot in one pass
+    over the column arrays.
+    """
+    if df.empty:
+        return []
+    df = df.reset_index(drop=True)
+    dates = pd.to_datetime(df['date'], format='mixed')
+    grouped = df.assign(date=dates).groupby(['account_name', 'date'], sort=True)
+    group_ids = grouped.ngroup().to_numpy()
+
+    snapshots = [{
+        'date': date.to_pydatetime(),
+        'account_name': account_name,
+        'recommending_me': [],
+        'my_recommendations': []
+    } for account_name, date in grouped.groups.keys()]
+    for group_id, tab, creator, subscribers, conversion_rate in zip(
+            group_ids, df['tab'].to_numpy(), df['creator'].to_numpy(),
+            df['subscribers'].to_numpy(), df['conversion_rate'].to_numpy()):
+        attr = 'recommending_me' if tab == 'recommending_me' else 'my_recommendations'
+        snapshots[group_id][attr].append({
+            'creator': creator,
+            'subscribers': subscribers,
+            'conversion_rate': conversion_rate
+        })
+    return snapshots
+
+def import_csv(db, source, batch_size=CSV_IMPORT_BATCH_SIZE, chunk_rows=CSV_IMPORT_CHUNK_ROWS, header=True,
+               account_name=None, day=None):
+    """Import referral CSV rows (a path or file object) into db as snapshots.
+
+    The file is read in chunks; the rows of the snapshot at the end of a chunk are carried into
+    the next one, so a snapshot's rows must be contiguous, as the scraper writes them. Snapshots
+    are written with DatabaseManager.add_snapshots, batch_size per transaction. account_name and
+    day ('YYYY-MM-DD') optionally filter the rows. Returns {'rows', 'snapshots', 'seconds', 'rows_per_second'}.
+    """
+    started = time.time()
+    rows = 0
+    imported = 0
+    pending = []
+    carry = None
+    session = db.Session()
+    try:
+        def flush(snapshots):
+            nonlocal imported
+            for start in range(0, len(snapshots), batch_size):
+                db.add_snapshots(session, snapshots[start:start + batch_size])
+                session.commit()
+            imported += len(snapshots)
+            if snapshots:
+                elapsed = time.time() - started
+                print(f"CSV import: {imported} snapshots from {rows} rows ({rows / elapsed if elapsed else 0:.0f} rows/sec)")
+
+        for chunk in read_csv_chunks(source, chunk_rows, header):
+            chunk = chunk[chunk['date'].notna() & (chunk['date'] != 'date')]  # Skip pasted header lines
+            if account_name:
+                chunk = chunk[chunk['account_name'].str.strip() == account_name.strip()]
+            if day:
+                chunk = chunk[pd.to_datetime(chunk['date'], format='mixed').dt.strftime('%Y-%m-%d') == day]
+            rows += len(chunk)
+            if carry is not None:
+                chunk = pd.concat([carry, chunk])
+            if chunk.empty:
+                carry = None
+                continue
+            # The last snapshot of the chunk may continue in the next one
+            last = ((chunk['account_name'] == chunk['account_name'].iloc[-1])
+                    & (chunk['date'] == chunk['date'].iloc[-1])).to_numpy()
+            carry = chunk[np.flip(np.logical_and.accumulate(np.flip(last)))]
+            pending.extend(snapshots_from_frame(chunk.iloc[:len(chunk) - len(carry)]))
+            if len(pending) >= batch_size:
+                flush(pending)
+                pending = []
+        if carry is not None:
+            pending.extend(snapshots_from_frame(carry))
+        flush(pending)
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+    seconds = time.time() - started
+    return {
+        'rows': rows,
+        'snapshots': imported,
+        'seconds': round(seconds, 2),
+        'rows_per_second': round(rows / seconds) if seconds else rows
+    }
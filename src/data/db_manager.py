@@ -1,26 +1,88 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, JSON, func, desc, case, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, func, desc, case, Boolean, Index, select, literal
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime, timedelta
-import pandas as pd
+from collections import defaultdict
+import numpy as np
 from pathlib import Path
-from ..utils.config import DATABASE_URL
+from ..utils.config import DATABASE_URL, MATERIALIZE_DAILY_SERIES, PARTITION_BY_MONTH, KEEP_INTRADAY_HISTORY
+from .partnership_metrics import DIRECTIONS, assemble_partnership_metrics
+from . import json_aggregates
+from .engine import get_engine, prepare_once
+from .json_aggregates import supports_json_aggregation, partner_listed
 import json
 import os
 import shutil
 import random
 import pytz
+import time
 
 Base = declarative_base()
 
+def parse_subscribers(value):
+    """Convert a scraped subscriber count like "1,234" to an int, 0 if unparseable"""
+    if not value:
+        return 0
+    try:
+        return int(float(str(value).replace(',', '').replace('%', '')))
+    except (ValueError, TypeError):
+        return 0
+
+def parse_conversion_rate(value):
+    """Convert a scraped conversion rate like "13.89%" to a float percentage, None if unparseable"""
+    if value is None:
+        return None
+    try:
+        return float(str(value).replace('%', '').strip())
+    except (ValueError, TypeError):
+        return None
+
+def normalize_entries(entries):
+    """Return partner entries with int subscribers and float conversion_rate (percentage)"""
+    normalized = []
+    for rec in entries or []:
+        entry = dict(rec)
+        entry['subscribers'] = parse_subscribers(rec.get('subscribers'))
+        entry['conversion_rate'] = parse_conversion_rate(rec.get('conversion_rate'))
+        normalized.append(entry)
+    return normalized
+
+# Snapshot lists are JSONB on PostgreSQL so partner containment (@>) can use GIN indexes
+SnapshotJSON = JSON().with_variant(JSONB(), 'postgresql')
+
 class ReferralData(Base):
     __tablename__ = 'referral_data'
+    __table_args__ = (
+        Index('ix_referral_data_recommending_me_gin', 'recommending_me',
+              postgresql_using='gin', postgresql_ops={'recommending_me': 'jsonb_path_ops'}).ddl_if(dialect='postgresql'),
+        Index('ix_referral_data_my_recommendations_gin', 'my_recommendations',
+              postgresql_using='gin', postgresql_ops={'my_recommendations': 'jsonb_path_ops'}).ddl_if(dialect='postgresql'),
+        Index('ix_referral_data_account_day', 'account_name', 'snapshot_day', unique=True),
+        Index('ix_referral_data_updated_at', 'updated_at'),
+    )
     
     id = Column(Integer, primary_key=True)
     date = Column(DateTime, default=datetime.utcnow)
     account_name = Column(String)
-    recommending_me = Column(JSON)
-    my_recommendations = Column(JSON)
+    recommending_me = Column(SnapshotJSON)
+    my_recommendations = Column(SnapshotJSON)
+    snapshot_day = Column(String(10))  # '%Y-%m-%d' of date for scraped snapshots (one per account and day), NULL for imports
+    updated_at = Column(DateTime)  # UTC time an upsert last replaced the snapshot in place, NULL if never
+
+class SnapshotHistory(Base):
+    """Every scrape as saved, including the intraday ones replaced in referral_data (KEEP_INTRADAY_HISTORY)"""
+    __tablename__ = 'snapshot_history'
+    __table_args__ = (
+        Index('ix_snapshot_history_account_date', 'account_name', 'date'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    date = Column(DateTime, nullable=False)
+    account_name = Column(String, nullable=False)
+    recommending_me = Column(SnapshotJSON)
+    my_recommendations = Column(SnapshotJSON)
 
 class AllowedAccount(Base):
     __tablename__ = 'allowed_accounts'
@@ -31,26 +93,267 @@ class AllowedAccount(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class ReferralSnapshotRow(Base):
+    """One partner entry of a ReferralData snapshot, flattened for indexed partner lookups"""
+    __tablename__ = 'referral_snapshot_row'
+    __table_args__ = (
+        Index('ix_snapshot_row_account_partner_date', 'account_name', 'partner', 'date'),
+        Index('ix_snapshot_row_account_date', 'account_name', 'date'),
+        Index('ix_snapshot_row_snapshot', 'snapshot_id'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    snapshot_id = Column(Integer, nullable=False)  # referral_data.id
+    date = Column(DateTime, nullable=False)
+    account_name = Column(String, nullable=False)
+    partner = Column(String, nullable=False)
+    direction = Column(String(8), nullable=False)  # 'received' (recommending_me) or 'sent' (my_recommendations)
+    position = Column(Integer, nullable=False)  # index within the source JSON list
+    subscribers = Column(Integer, nullable=False, default=0)
+    conversion_rate = Column(Float)
+
+SNAPSHOT_DIRECTIONS = (('received', 'recommending_me'), ('sent', 'my_recommendations'))
+
+class SnapshotView:
+    """Creator-keyed read model over one snapshot's JSON lists, built once per loaded record.
+
+    The first entry for a creator wins, matching next() over the list.
+    """
+    __slots__ = ('record', 'date', 'account_name', '_received', '_sent')
+
+    def __init__(self, record):
+        self.record = record
+        self.date = record.date
+        self.account_name = record.account_name
+        self._received = {}
+        for rec in record.recommending_me or []:
+            self._received.setdefault(rec['creator'], rec)
+        self._sent = {}
+        for rec in record.my_recommendations or []:
+            self._sent.setdefault(rec['creator'], rec)
+
+    def received_entry(self, partner):
+        return self._received.get(partner)
+
+    def sent_entry(self, partner):
+        return self._sent.get(partner)
+
+    def received(self, partner, default=0):
+        entry = self._received.get(partner)
+        return entry.get('subscribers', 0) if entry else default
+
+    def sent(self, partner, default=0):
+        entry = self._sent.get(partner)
+        return entry.get('subscribers', 0) if entry else default
+
+    def received_partners(self):
+        return self._received.keys()
+
+    def sent_partners(self):
+        return self._sent.keys()
+
+class AccountRollup(Base):
+    """Account totals per day/week/month, closing at the period's last snapshot"""
+    __tablename__ = 'account_rollup'
+    __table_args__ = (
+        Index('ix_account_rollup_period', 'account_name', 'grain', 'period_key', unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    account_name = Column(String, nullable=False)
+    grain = Column(String(8), nullable=False)  # 'day', 'week' or 'month'
+    period_key = Column(String(10), nullable=False)  # '%Y-%m-%d', '%Y-%W' or '%Y-%m'
+    first_date = Column(DateTime, nullable=False)
+    last_date = Column(DateTime, nullable=False)
+    snapshot_count = Column(Integer, nullable=False, default=0)
+    received = Column(Integer, nullable=False, default=0)
+    sent = Column(Integer, nullable=False, default=0)
+
+class PartnerRollup(Base):
+    """Per-partner peak values and latest valid conversion rates per day/week/month"""
+    __tablename__ = 'partner_rollup'
+    __table_args__ = (
+        Index('ix_partner_rollup_period', 'account_name', 'partner', 'grain', 'period_key', unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    account_name = Column(String, nullable=False)
+    partner = Column(String, nullable=False)
+    grain = Column(String(8), nullable=False)
+    period_key = Column(String(10), nullable=False)
+    max_received = Column(Integer, nullable=False, default=0)
+    max_sent = Column(Integer, nullable=False, default=0)
+    received_rate = Column(Float)  # Last valid rate in the period, as a percentage
+    sent_rate = Column(Float)
+
+class DailySeries(Base):
+    """Gap-filled daily partner values: observed days from the day rollups, missing days interpolated"""
+    __tablename__ = 'daily_series'
+    __table_args__ = (
+        Index('ix_daily_series_account_partner_day', 'account_name', 'partner', 'day', unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    account_name = Column(String, nullable=False)
+    partner = Column(String, nullable=False)
+    day = Column(DateTime, nullable=False)  # Midnight of the day
+    received = Column(Integer, nullable=False, default=0)
+    sent = Column(Integer, nullable=False, default=0)
+    received_rate = Column(Float)  # Observed days only, as a percentage
+    sent_rate = Column(Float)
+    interpolated = Column(Boolean, nullable=False, default=False)
+
+class LatestSnapshot(Base):
+    """Copy of each account's most recent ReferralData snapshot, replaced on every ingest"""
+    __tablename__ = 'latest_snapshot'
+
+    account_name = Column(String, primary_key=True)
+    snapshot_id = Column(Integer, nullable=False)  # referral_data.id
+    date = Column(DateTime, nullable=False)
+    recommending_me = Column(SnapshotJSON)
+    my_recommendations = Column(SnapshotJSON)
+
+class PartnerBaseline(Base):
+    """First non-zero value of each (account, partner, direction), maintained on every ingest"""
+    __tablename__ = 'partner_baseline'
+    __table_args__ = (
+        Index('ix_partner_baseline_key', 'account_name', 'partner', 'direction', unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    account_name = Column(String, nullable=False)
+    partner = Column(String, nullable=False)
+    direction = Column(String(8), nullable=False)  # 'received' or 'sent', as in referral_snapshot_row
+    snapshot_id = Column(Integer, nullable=False)  # Earliest snapshot with a non-zero entry
+    date = Column(DateTime, nullable=False)
+    value = Column(Integer, nullable=False)  # First non-zero entry of that snapshot
+
+class IngestReceipt(Base):
+    """Idempotency key of every snapshot synced from a scraper's local ingest buffer"""
+    __tablename__ = 'ingest_receipt'
+
+    idempotency_key = Column(String(32), primary_key=True)
+    account_name = Column(String, nullable=False)
+    snapshot_id = Column(Integer)  # referral_data.id written, NULL if the day already had a later snapshot
+    received_at = Column(DateTime, default=datetime.utcnow)
+
+class SchemaVersion(Base):
+    """One row per applied migration of src/data/migrations.py"""
+    __tablename__ = 'schema_version'
+
+    version = Column(Integer, primary_key=True)
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
+class DataVersion(Base):
+    """Change counter per data scope, bumped in the same transaction as every write"""
+    __tablename__ = 'data_version'
+
+    scope = Column(String, primary_key=True)  # account name, DATA_VERSION_ALL or DATA_VERSION_MAINTENANCE
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+DATA_VERSION_ALL = '__all__'  # Bumped by any write to any account
+DATA_VERSION_MAINTENANCE = '__maintenance__'  # Bumped when derived tables are rebuilt
+
+class RecommendationSummary(Base):
+    """Per-account header of the precomputed partnership recommendations"""
+    __tablename__ = 'recommendation_summary'
+
+    account_name = Column(String, primary_key=True)
+    your_avg_volume = Column(Integer, nullable=False, default=0)
+    top_partners = Column(JSON)
+    data_version = Column(Integer, nullable=False)  # DATA_VERSION_ALL version the ranking was computed from
+    window_start = Column(DateTime, nullable=False)
+    window_end = Column(DateTime, nullable=False)
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+class PartnerRecommendation(Base):
+    """One ranked recommendation candidate for an account"""
+    __tablename__ = 'partner_recommendation'
+    __table_args__ = (
+        Index('ix_partner_recommendation_account_rank', 'account_name', 'rank'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    account_name = Column(String, nullable=False)
+    rank = Column(Integer, nullable=False)
+    partner = Column(String, nullable=False)
+    monthly_volume = Column(Integer, nullable=False)
+    partner_type = Column(String(8), nullable=False)  # 'creator' or 'client'
+    client = Column(String)
+    current_partnerships = Column(JSON)
+    example_partnership = Column(String)
+    volume_match = Column(String)
+
+ROLLUP_GRAINS = ('day', 'week', 'month')
+
+def period_key(grain, date):
+    """Key a date by rollup grain, matching the strftime keys used by the API"""
+    if grain == 'week':
+        return date.strftime('%Y-%W')
+    if grain == 'month':
+        return date.strftime('%Y-%m')
+    return date.strftime('%Y-%m-%d')
+
+def period_bounds(grain, date):
+    """Return the [start, end) datetimes of the period containing date"""
+    day = datetime(date.year, date.month, date.day)
+    if grain == 'week':
+        # %W weeks start on Monday and are cut at year boundaries
+        monday = day - timedelta(days=day.weekday())
+        return (max(monday, datetime(day.year, 1, 1)),
+                min(monday + timedelta(days=7), datetime(day.year + 1, 1, 1)))
+    if grain == 'month':
+        if day.month == 12:
+            return datetime(day.year, 12, 1), datetime(day.year + 1, 1, 1)
+        return datetime(day.year, day.month, 1), datetime(day.year, day.month + 1, 1)
+    return day, day + timedelta(days=1)
+
+TIMEZONE = pytz.timezone('America/Los_Angeles')  # Snapshot dates are PT wall-clock time
+
+def as_naive(date):
+    """Drop tzinfo; dates are stored as naive PT wall-clock time"""
+    return date.replace(tzinfo=None) if date is not None and date.tzinfo else date
+
 class DatabaseManager:
     def __init__(self):
-        self.engine = create_engine(DATABASE_URL)
-        Base.metadata.create_all(self.engine)
+        self.engine = get_engine(DATABASE_URL)
         self.Session = sessionmaker(bind=self.engine)
-        self.timezone = pytz.timezone('America/Los_Angeles')
-    
+        self.timezone = TIMEZONE
+        self._partner_graph = None
+        self._partner_graph_version = None
+        self._volume_index = None
+        self._volume_index_version = None
+        self.materialize_daily_series = MATERIALIZE_DAILY_SERIES
+        self.keep_intraday_history = KEEP_INTRADAY_HISTORY
+        # Schema checks and DDL run once per process; later instances share the engine and the result
+        self.upsert_snapshots = prepare_once(self.engine, self._prepare_schema)
+
+    def _prepare_schema(self, engine):
+        """Apply pending schema migrations (one query when current), then the partitions.
+        Returns whether save_data can upsert"""
+        from .migrations import prepare, SNAPSHOT_DAY_KEY_VERSION
+
+        applied = prepare(self)
+        if PARTITION_BY_MONTH:
+            self.ensure_partitions()
+        if engine.dialect.name in ('sqlite', 'postgresql') and SNAPSHOT_DAY_KEY_VERSION in applied:
+            return True
+        print("Snapshot upserts disabled: run python scripts/migrate.py upgrade --manual to add the (account, day) key")
+        return False
+
+    def ensure_partitions(self):
+        """Create the current and upcoming monthly partitions of the partitioned tables (PostgreSQL only)"""
+        from .partitioning import ensure_partitions
+        return ensure_partitions(self.engine)
+
     def save_data(self, account_name, recommending_me, my_recommendations):
-        """Save referral data to database with PT timezone"""
+        """Save referral data to database with PT timezone, replacing the account's earlier snapshot of the day"""
         session = self.Session()
         try:
             # Convert current time to PT
             pt_now = datetime.now(self.timezone)
-            data = ReferralData(
-                date=pt_now,
-                account_name=account_name,
-                recommending_me=recommending_me,
-                my_recommendations=my_recommendations
-            )
-            session.add(data)
+            self.store_snapshot(session, account_name, pt_now, recommending_me, my_recommendations)
             session.commit()
             print(f"Data saved for account: {account_name} at {pt_now}")
         except Exception as e:
@@ -59,6 +362,1140 @@ class DatabaseManager:
         finally:
             session.close()
     
+    def store_snapshot(self, session, account_name, date, recommending_me, my_recommendations):
+        """Write a scraped snapshot to an open session: the intraday history row if enabled, then the
+        day's upsert (a plain insert until the (account, day) key exists)"""
+        if self.keep_intraday_history:
+            session.add(SnapshotHistory(
+                date=date,
+                account_name=account_name,
+                recommending_me=normalize_entries(recommending_me),
+                my_recommendations=normalize_entries(my_recommendations)
+            ))
+        if self.upsert_snapshots:
+            return self.upsert_snapshot(session, account_name, date, recommending_me, my_recommendations)
+        return self.add_snapshot(session, account_name, date, recommending_me, my_recommendations)
+
+    def add_snapshot(self, session, account_name, date, recommending_me, my_recommendations):
+        """Add a ReferralData record plus its flattened partner rows to an open session.
+
+        Subscriber counts and conversion rates are stored as numbers so readers never parse strings.
+        """
+        record = ReferralData(
+            date=date,
+            account_name=account_name,
+            recommending_me=normalize_entries(recommending_me),
+            my_recommendations=normalize_entries(my_recommendations)
+        )
+        session.add(record)
+        session.flush()  # Assign record.id for the partner rows
+        self._write_snapshot_rows(session, record)
+        self._refresh_rollups(session, account_name, [date])
+        if self.materialize_daily_series:
+            self._refresh_daily_series(session, account_name, [date])
+        self._replace_latest_snapshot(session, record)
+        self._update_baselines(session, record)
+        self._bump_data_versions(session, [account_name, DATA_VERSION_ALL])
+        return record
+
+    def add_snapshots(self, session, snapshots):
+        """Bulk add_snapshot for dicts with date, account_name, recommending_me and my_recommendations.
+
+        Snapshots and partner rows are each inserted with one executemany; rollups, daily series,
+        latest snapshot and baselines are refreshed once per account instead of once per snapshot.
+        Returns the new ids in the order of snapshots.
+        """
+        if not snapshots:
+            return []
+        values = [{
+            'date': snapshot['date'],
+            'account_name': snapshot['account_name'],
+            'recommending_me': normalize_entries(snapshot['recommending_me']),
+            'my_recommendations': normalize_entries(snapshot['my_recommendations'])
+        } for snapshot in snapshots]
+        ids = session.execute(
+            ReferralData.__table__.insert().returning(ReferralData.id, sort_by_parameter_order=True), values
+        ).scalars().all()
+
+        rows = []
+        affected = defaultdict(list)
+        for snapshot_id, value in zip(ids, values):
+            rows.extend(self._snapshot_rows(ReferralData(id=snapshot_id, **value)))
+            affected[value['account_name']].append(value['date'])
+        if rows:
+            session.execute(ReferralSnapshotRow.__table__.insert(), rows)
+        for account_name, dates in affected.items():
+            self._refresh_rollup_span(session, account_name, dates)
+            if self.materialize_daily_series:
+                self._refresh_daily_series(session, account_name, dates)
+            self._refresh_latest_snapshot(session, account_name)
+            self._refresh_baselines(session, account_name)
+        self._bump_data_versions(session, list(affected) + [DATA_VERSION_ALL])
+        return ids
+
+    def upsert_snapshot(self, session, account_name, date, recommending_me, my_recommendations):
+        """Insert the account's snapshot for date's day, or replace the one already stored for that day.
+
+        One statement keyed by (account_name, snapshot_day): INSERT ... ON CONFLICT DO UPDATE on both
+        PostgreSQL and SQLite, so retries and manual runs never add rows. A stored snapshot is only
+        replaced by a later one; it keeps its id, and updated_at records when its contents changed.
+        Returns the stored record, or None if the day already has a later snapshot.
+        """
+        day = period_key('day', as_naive(date))
+        previous = session.query(ReferralData.id)\
+            .filter(ReferralData.account_name == account_name)\
+            .filter(ReferralData.snapshot_day == day)\
+            .scalar()
+
+        dialect = self.engine.dialect.name
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        statement = insert(ReferralData).values(
+            date=date,
+            account_name=account_name,
+            snapshot_day=day,
+            recommending_me=normalize_entries(recommending_me),
+            my_recommendations=normalize_entries(my_recommendations)
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=['account_name', 'snapshot_day'],
+            set_={
+                'updated_at': datetime.utcnow(),
+                'date': statement.excluded.date,
+                'recommending_me': statement.excluded.recommending_me,
+                'my_recommendations': statement.excluded.my_recommendations
+            },
+            where=ReferralData.date <= statement.excluded.date
+        ).returning(ReferralData.id)
+        snapshot_id = session.execute(statement).scalar()
+        if snapshot_id is None:
+            return None
+
+        # The session may still hold the replaced version of the row
+        record = session.get(ReferralData, snapshot_id, populate_existing=True)
+        if previous is not None:
+            session.query(ReferralSnapshotRow)\
+                .filter(ReferralSnapshotRow.snapshot_id == previous)\
+                .delete(synchronize_session=False)
+        self._write_snapshot_rows(session, record)
+        self._refresh_rollups(session, account_name, [date])
+        if self.materialize_daily_series:
+            self._refresh_daily_series(session, account_name, [date])
+        if previous is not None:
+            self._refresh_latest_snapshot(session, account_name)
+            self._refresh_baselines(session, account_name)
+        else:
+            self._replace_latest_snapshot(session, record)
+            self._update_baselines(session, record)
+        self._bump_data_versions(session, [account_name, DATA_VERSION_ALL])
+        return record
+
+    def _bump_data_versions(self, session, scopes):
+        """Increment the data version of each scope, creating missing scopes at version 1"""
+        now = datetime.utcnow()
+        for scope in scopes:
+            updated = session.query(DataVersion)\
+                .filter(DataVersion.scope == scope)\
+                .update({DataVersion.version: DataVersion.version + 1, DataVersion.updated_at: now},
+                        synchronize_session=False)
+            if not updated:
+                session.add(DataVersion(scope=scope, version=1, updated_at=now))
+                session.flush()
+
+    def bump_maintenance_version(self):
+        """Invalidate everything derived from the data, e.g. after rebuilding derived tables"""
+        session = self.Session()
+        try:
+            self._bump_data_versions(session, [DATA_VERSION_MAINTENANCE])
+            session.commit()
+        finally:
+            session.close()
+
+    def get_data_versions(self, scopes):
+        """Get {scope: (version, updated_at)} for the given scopes; unknown scopes are (0, None)"""
+        session = self.Session()
+        try:
+            versions = {scope: (0, None) for scope in scopes}
+            for row in session.query(DataVersion).filter(DataVersion.scope.in_(list(scopes))):
+                versions[row.scope] = (row.version, row.updated_at)
+            return versions
+        finally:
+            session.close()
+
+    def _replace_latest_snapshot(self, session, record):
+        """Point latest_snapshot at record unless the account already has a newer snapshot"""
+        current = session.get(LatestSnapshot, record.account_name)
+        if current is None:
+            current = LatestSnapshot(account_name=record.account_name)
+            session.add(current)
+        elif as_naive(current.date) > as_naive(record.date):
+            return
+        current.snapshot_id = record.id
+        current.date = record.date
+        current.recommending_me = record.recommending_me
+        current.my_recommendations = record.my_recommendations
+
+    def _refresh_latest_snapshot(self, session, account_name):
+        """Recompute an account's latest_snapshot from referral_data, e.g. after deletes"""
+        session.query(LatestSnapshot)\
+            .filter(LatestSnapshot.account_name == account_name)\
+            .delete(synchronize_session=False)
+        record = session.query(ReferralData)\
+            .filter(ReferralData.account_name == account_name)\
+            .order_by(ReferralData.date.desc(), ReferralData.id.desc())\
+            .first()
+        if record:
+            session.add(LatestSnapshot(
+                account_name=account_name,
+                snapshot_id=record.id,
+                date=record.date,
+                recommending_me=record.recommending_me,
+                my_recommendations=record.my_recommendations
+            ))
+
+    def _update_baselines(self, session, record):
+        """Record the record's non-zero entries as baselines where they are the account's earliest"""
+        candidates = {}
+        for direction, attr in SNAPSHOT_DIRECTIONS:
+            for rec in getattr(record, attr) or []:
+                value = parse_subscribers(rec.get('subscribers'))
+                if value > 0:
+                    candidates.setdefault((rec['creator'], direction), value)
+        if not candidates:
+            return
+
+        stored = {(b.partner, b.direction): b for b in session.query(PartnerBaseline)
+                  .filter(PartnerBaseline.account_name == record.account_name)
+                  .filter(PartnerBaseline.partner.in_({partner for partner, _ in candidates}))}
+        date = as_naive(record.date)
+        for (partner, direction), value in candidates.items():
+            baseline = stored.get((partner, direction))
+            if baseline is None:
+                session.add(PartnerBaseline(account_name=record.account_name, partner=partner, direction=direction,
+                                            snapshot_id=record.id, date=record.date, value=value))
+            elif (date, record.id) < (as_naive(baseline.date), baseline.snapshot_id):
+                # Snapshot imported out of order, earlier than the stored baseline
+                baseline.snapshot_id = record.id
+                baseline.date = record.date
+                baseline.value = value
+
+    def _first_nonzero_rows(self, session, account_names=None, start=None, end=None):
+        """Query the first non-zero referral_snapshot_row per (account, partner, direction) between start and end"""
+        rank = func.row_number().over(
+            partition_by=(ReferralSnapshotRow.account_name, ReferralSnapshotRow.partner, ReferralSnapshotRow.direction),
+            order_by=(ReferralSnapshotRow.date, ReferralSnapshotRow.snapshot_id, ReferralSnapshotRow.position)
+        ).label('rank')
+        ranked = session.query(
+            ReferralSnapshotRow.account_name,
+            ReferralSnapshotRow.partner,
+            ReferralSnapshotRow.direction,
+            ReferralSnapshotRow.snapshot_id,
+            ReferralSnapshotRow.date,
+            ReferralSnapshotRow.subscribers,
+            rank
+        ).filter(ReferralSnapshotRow.subscribers > 0)
+        if account_names is not None:
+            ranked = ranked.filter(ReferralSnapshotRow.account_name.in_(list(account_names)))
+        if start is not None:
+            ranked = ranked.filter(ReferralSnapshotRow.date >= start)
+        if end is not None:
+            ranked = ranked.filter(ReferralSnapshotRow.date <= end)
+        ranked = ranked.subquery()
+        return session.query(
+            ranked.c.account_name, ranked.c.partner, ranked.c.direction,
+            ranked.c.snapshot_id, ranked.c.date, ranked.c.subscribers
+        ).filter(ranked.c.rank == 1)
+
+    def _refresh_baselines(self, session, account_name):
+        """Recompute an account's partner_baseline rows from referral_snapshot_row, e.g. after deletes"""
+        session.query(PartnerBaseline)\
+            .filter(PartnerBaseline.account_name == account_name)\
+            .delete(synchronize_session=False)
+        rows = [{
+            'account_name': account_name,
+            'partner': partner,
+            'direction': direction,
+            'snapshot_id': snapshot_id,
+            'date': date,
+            'value': value
+        } for _, partner, direction, snapshot_id, date, value in self._first_nonzero_rows(session, [account_name])]
+        if rows:
+            session.execute(PartnerBaseline.__table__.insert(), rows)
+        return len(rows)
+
+    def _write_snapshot_rows(self, session, record):
+        """Insert one referral_snapshot_row per partner entry of a record"""
+        rows = self._snapshot_rows(record)
+        if rows:
+            session.execute(ReferralSnapshotRow.__table__.insert(), rows)
+        return len(rows)
+
+    def _snapshot_rows(self, record):
+        """referral_snapshot_row values for each partner entry of a record"""
+        rows = []
+        for direction, attr in SNAPSHOT_DIRECTIONS:
+            for position, rec in enumerate(getattr(record, attr) or []):
+                rows.append({
+                    'snapshot_id': record.id,
+                    'date': record.date,
+                    'account_name': record.account_name,
+                    'partner': rec['creator'],
+                    'direction': direction,
+                    'position': position,
+                    'subscribers': parse_subscribers(rec.get('subscribers')),
+                    'conversion_rate': parse_conversion_rate(rec.get('conversion_rate'))
+                })
+        return rows
+
+    def delete_records(self, session, record_ids=None):
+        """Delete ReferralData records and their derived rows. Deletes everything if record_ids is None"""
+        if record_ids is None:
+            session.query(ReferralSnapshotRow).delete(synchronize_session=False)
+            session.query(AccountRollup).delete(synchronize_session=False)
+            session.query(PartnerRollup).delete(synchronize_session=False)
+            session.query(LatestSnapshot).delete(synchronize_session=False)
+            session.query(PartnerBaseline).delete(synchronize_session=False)
+            session.query(DailySeries).delete(synchronize_session=False)
+            session.query(SnapshotHistory).delete(synchronize_session=False)
+            session.query(DataVersion)\
+                .filter(DataVersion.scope.notin_([DATA_VERSION_ALL, DATA_VERSION_MAINTENANCE]))\
+                .update({DataVersion.version: DataVersion.version + 1, DataVersion.updated_at: datetime.utcnow()},
+                        synchronize_session=False)
+            self._bump_data_versions(session, [DATA_VERSION_ALL])
+            return session.query(ReferralData).delete(synchronize_session=False)
+
+        record_ids = list(record_ids)
+        if not record_ids:
+            return 0
+        return self.delete_selected(session, record_ids)
+
+    def delete_selected(self, session, ids):
+        """Delete the ReferralData records whose ids are listed or selected by a SELECT of ids, with one
+        DELETE per table, then refresh the derived rows of the affected accounts. Returns the number deleted"""
+        session.execute(ReferralSnapshotRow.__table__.delete()
+                        .where(ReferralSnapshotRow.snapshot_id.in_(ids)))
+        deleted = session.execute(ReferralData.__table__.delete()
+                                  .where(ReferralData.id.in_(ids))
+                                  .returning(ReferralData.account_name, ReferralData.date)).all()
+        affected = defaultdict(list)
+        for account_name, date in deleted:
+            affected[account_name].append(date)
+        self._refresh_after_delete(session, affected)
+        return len(deleted)
+
+    def _refresh_after_delete(self, session, affected):
+        """Refresh derived rows for {account_name: [dates of deleted snapshots]}"""
+        for account_name, dates in affected.items():
+            self._refresh_rollups(session, account_name, dates)
+            if self.materialize_daily_series:
+                self._refresh_daily_series(session, account_name, dates)
+            self._refresh_latest_snapshot(session, account_name)
+            self._refresh_baselines(session, account_name)
+        if affected:
+            self._bump_data_versions(session, list(affected) + [DATA_VERSION_ALL])
+
+    def _load_rollup_inputs(self, session, account_name, start, end, partner=None, end_inclusive=False):
+        """Load (id, date) snapshots and partner rows of an account between start and end"""
+        snapshots = session.query(ReferralData.id, ReferralData.date)\
+            .filter(ReferralData.account_name == account_name)
+        rows = session.query(ReferralSnapshotRow)\
+            .filter(ReferralSnapshotRow.account_name == account_name)
+        if partner is not None:
+            rows = rows.filter(ReferralSnapshotRow.partner == partner)
+        if start is not None:
+            snapshots = snapshots.filter(ReferralData.date >= start)
+            rows = rows.filter(ReferralSnapshotRow.date >= start)
+        if end is not None:
+            if end_inclusive:
+                snapshots = snapshots.filter(ReferralData.date <= end)
+                rows = rows.filter(ReferralSnapshotRow.date <= end)
+            else:
+                snapshots = snapshots.filter(ReferralData.date < end)
+                rows = rows.filter(ReferralSnapshotRow.date < end)
+        return (snapshots.order_by(ReferralData.date).all(),
+                rows.order_by(ReferralSnapshotRow.position).all())
+
+    def _summarize_periods(self, grain, snapshots, rows):
+        """Group snapshots and their partner rows into account and partner summaries keyed by period"""
+        totals = defaultdict(lambda: {'received': 0, 'sent': 0})
+        first_entries = defaultdict(dict)  # snapshot_id -> {(partner, direction): row}
+        for row in rows:
+            totals[row.snapshot_id][row.direction] += row.subscribers
+            first_entries[row.snapshot_id].setdefault((row.partner, row.direction), row)
+
+        accounts = {}
+        partners = {}
+        for snapshot_id, date in snapshots:
+            key = period_key(grain, date)
+            account = accounts.setdefault(key, {
+                'period_key': key,
+                'first_date': date,
+                'last_date': date,
+                'snapshot_count': 0,
+                'received': 0,
+                'sent': 0
+            })
+            account['last_date'] = date
+            account['snapshot_count'] += 1
+            account['received'] = totals[snapshot_id]['received']
+            account['sent'] = totals[snapshot_id]['sent']
+
+            for (partner, direction), row in first_entries[snapshot_id].items():
+                summary = partners.setdefault((key, partner), {
+                    'period_key': key,
+                    'partner': partner,
+                    'max_received': 0,
+                    'max_sent': 0,
+                    'received_rate': None,
+                    'sent_rate': None
+                })
+                summary[f'max_{direction}'] = max(summary[f'max_{direction}'], row.subscribers)
+                rate = row.conversion_rate
+                if rate is not None and 0 <= rate <= 100:
+                    summary[f'{direction}_rate'] = rate
+        return accounts, partners
+
+    def _refresh_rollups(self, session, account_name, dates):
+        """Recompute the day/week/month rollups of an account for the periods containing dates"""
+        for grain in ROLLUP_GRAINS:
+            periods = {period_key(grain, as_naive(d)): period_bounds(grain, as_naive(d)) for d in dates}
+            for key, (start, end) in periods.items():
+                snapshots, rows = self._load_rollup_inputs(session, account_name, start, end)
+                accounts, partners = self._summarize_periods(grain, snapshots, rows)
+                self._replace_rollups(session, account_name, grain, [key], accounts, partners)
+
+    def _refresh_rollup_span(self, session, account_name, dates):
+        """_refresh_rollups for many dates at once: the span covering all their periods is loaded once"""
+        dates = [as_naive(d) for d in dates]
+        start = min(period_bounds(grain, min(dates))[0] for grain in ROLLUP_GRAINS)
+        end = max(period_bounds(grain, max(dates))[1] for grain in ROLLUP_GRAINS)
+        snapshots, rows = self._load_rollup_inputs(session, account_name, start, end)
+        for grain in ROLLUP_GRAINS:
+            keys = {period_key(grain, d) for d in dates}
+            # Periods without any of dates may be cut by the span, so only the periods of dates are replaced
+            accounts, partners = self._summarize_periods(grain, snapshots, rows)
+            self._replace_rollups(session, account_name, grain, list(keys),
+                                  {key: summary for key, summary in accounts.items() if key in keys},
+                                  {key: summary for key, summary in partners.items() if key[0] in keys})
+
+    def _replace_rollups(self, session, account_name, grain, keys, accounts, partners):
+        """Swap the stored rollups of the given periods for freshly computed summaries"""
+        session.query(AccountRollup)\
+            .filter(AccountRollup.account_name == account_name)\
+            .filter(AccountRollup.grain == grain)\
+            .filter(AccountRollup.period_key.in_(keys))\
+            .delete(synchronize_session=False)
+        session.query(PartnerRollup)\
+            .filter(PartnerRollup.account_name == account_name)\
+            .filter(PartnerRollup.grain == grain)\
+            .filter(PartnerRollup.period_key.in_(keys))\
+            .delete(synchronize_session=False)
+        if accounts:
+            session.execute(AccountRollup.__table__.insert(), [
+                dict(summary, account_name=account_name, grain=grain) for summary in accounts.values()
+            ])
+        if partners:
+            session.execute(PartnerRollup.__table__.insert(), [
+                dict(summary, account_name=account_name, grain=grain) for summary in partners.values()
+            ])
+
+    def _refresh_daily_series(self, session, account_name, dates):
+        """Rewrite an account's daily series between the observed days around each of dates.
+
+        A snapshot only changes its own day and the interpolated gaps on either side of it,
+        so late or backfilled snapshots re-interpolate just that window.
+        """
+        windows = set()
+        for key in {period_key('day', as_naive(date)) for date in dates}:
+            observed = session.query(AccountRollup.period_key)\
+                .filter(AccountRollup.account_name == account_name)\
+                .filter(AccountRollup.grain == 'day')
+            before = observed.filter(AccountRollup.period_key < key)\
+                .order_by(AccountRollup.period_key.desc()).first()
+            after = observed.filter(AccountRollup.period_key > key)\
+                .order_by(AccountRollup.period_key).first()
+            windows.add((before[0] if before else key, after[0] if after else key))
+
+        for first_key, last_key in windows:
+            session.query(DailySeries)\
+                .filter(DailySeries.account_name == account_name)\
+                .filter(DailySeries.day >= datetime.strptime(first_key, '%Y-%m-%d'))\
+                .filter(DailySeries.day <= datetime.strptime(last_key, '%Y-%m-%d'))\
+                .delete(synchronize_session=False)
+            rows = self._densify_days(session, account_name, first_key, last_key)
+            if rows:
+                session.execute(DailySeries.__table__.insert(), rows)
+
+    def _densify_days(self, session, account_name, first_key, last_key):
+        """daily_series rows for every day from first_key to last_key, from the day rollups.
+
+        Missing days take the partners of the previous observed day, interpolated towards the next
+        observed day like interpolate_missing_days (a partner missing there keeps its value).
+        """
+        from .interpolation import interpolate_values
+
+        observed = [key for (key,) in session.query(AccountRollup.period_key)
+                    .filter(AccountRollup.account_name == account_name)
+                    .filter(AccountRollup.grain == 'day')
+                    .filter(AccountRollup.period_key >= first_key)
+                    .filter(AccountRollup.period_key <= last_key)
+                    .order_by(AccountRollup.period_key)]
+        partners = defaultdict(dict)  # period_key -> {partner: PartnerRollup}
+        for rollup in session.query(PartnerRollup)\
+                .filter(PartnerRollup.account_name == account_name)\
+                .filter(PartnerRollup.grain == 'day')\
+                .filter(PartnerRollup.period_key >= first_key)\
+                .filter(PartnerRollup.period_key <= last_key)\
+                .order_by(PartnerRollup.id):
+            partners[rollup.period_key][rollup.partner] = rollup
+
+        rows = []
+        for i, key in enumerate(observed):
+            day = datetime.strptime(key, '%Y-%m-%d')
+            for partner, rollup in partners[key].items():
+                rows.append({
+                    'account_name': account_name, 'partner': partner, 'day': day,
+                    'received': rollup.max_received, 'sent': rollup.max_sent,
+                    'received_rate': rollup.received_rate, 'sent_rate': rollup.sent_rate,
+                    'interpolated': False
+                })
+            if i + 1 == len(observed) or not partners[key]:
+                continue
+
+            next_partners = partners[observed[i + 1]]
+            total_days = (datetime.strptime(observed[i + 1], '%Y-%m-%d') - day).days
+            progress = [offset / total_days for offset in range(1, total_days)]
+            names = list(partners[key])
+            interpolated = {}
+            for direction in ('received', 'sent'):
+                prev_values = [getattr(partners[key][name], f'max_{direction}') for name in names]
+                next_values = [getattr(next_partners[name], f'max_{direction}') if name in next_partners else prev
+                               for name, prev in zip(names, prev_values)]
+                interpolated[direction] = interpolate_values(prev_values, next_values, progress)
+            for offset in range(1, total_days):
+                for n, name in enumerate(names):
+                    rows.append({
+                        'account_name': account_name, 'partner': name, 'day': day + timedelta(days=offset),
+                        'received': interpolated['received'][offset - 1][n],
+                        'sent': interpolated['sent'][offset - 1][n],
+                        'received_rate': None, 'sent_rate': None,
+                        'interpolated': True
+                    })
+        return rows
+
+    def rebuild_rollups(self):
+        """Rebuild every account and partner rollup from referral_snapshot_row"""
+        session = self.Session()
+        try:
+            session.query(AccountRollup).delete(synchronize_session=False)
+            session.query(PartnerRollup).delete(synchronize_session=False)
+            accounts = [a[0] for a in session.query(ReferralData.account_name).distinct().all()]
+            for account_name in accounts:
+                snapshots, rows = self._load_rollup_inputs(session, account_name, None, None)
+                for grain in ROLLUP_GRAINS:
+                    account_periods, partner_periods = self._summarize_periods(grain, snapshots, rows)
+                    self._replace_rollups(session, account_name, grain, list(account_periods),
+                                          account_periods, partner_periods)
+                session.commit()
+                print(f"Rebuilt rollups for {account_name} ({len(snapshots)} snapshots)")
+            return len(accounts)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def rebuild_latest_snapshots(self):
+        """Rebuild latest_snapshot for every account in referral_data"""
+        session = self.Session()
+        try:
+            session.query(LatestSnapshot).delete(synchronize_session=False)
+            accounts = [a[0] for a in session.query(ReferralData.account_name).distinct().all()]
+            for account_name in accounts:
+                self._refresh_latest_snapshot(session, account_name)
+            session.commit()
+            return len(accounts)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def rebuild_daily_series(self):
+        """Rebuild the gap-filled daily series of every account from the day rollups"""
+        session = self.Session()
+        try:
+            session.query(DailySeries).delete(synchronize_session=False)
+            total = 0
+            for account_name, first_key, last_key in session.query(
+                    AccountRollup.account_name, func.min(AccountRollup.period_key), func.max(AccountRollup.period_key))\
+                    .filter(AccountRollup.grain == 'day')\
+                    .group_by(AccountRollup.account_name):
+                rows = self._densify_days(session, account_name, first_key, last_key)
+                if rows:
+                    session.execute(DailySeries.__table__.insert(), rows)
+                total += len(rows)
+            session.commit()
+            return total
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def get_daily_series(self, account_name, partner, start_date, end_date):
+        """Get one entry per day of a partner's gap-filled series, oldest first.
+
+        Covers the days between the account's first and last snapshot; days where the partner
+        is not listed report 0. Entries match get_rollup_periods plus an 'interpolated' flag.
+        """
+        session = self.Session()
+        try:
+            first_key, last_key = session.query(func.min(AccountRollup.period_key), func.max(AccountRollup.period_key))\
+                .filter(AccountRollup.account_name == account_name)\
+                .filter(AccountRollup.grain == 'day')\
+                .one()
+            if first_key is None:
+                return []
+            first_day = max(datetime.strptime(first_key, '%Y-%m-%d'), period_bounds('day', start_date)[0])
+            last_day = min(datetime.strptime(last_key, '%Y-%m-%d'), end_date)
+
+            observed = {key for (key,) in session.query(AccountRollup.period_key)
+                        .filter(AccountRollup.account_name == account_name)
+                        .filter(AccountRollup.grain == 'day')
+                        .filter(AccountRollup.period_key >= period_key('day', first_day))
+                        .filter(AccountRollup.period_key <= period_key('day', last_day))}
+            stored = {row.day: row for row in session.query(DailySeries)
+                      .filter(DailySeries.account_name == account_name)
+                      .filter(DailySeries.partner == partner)
+                      .filter(DailySeries.day >= first_day)
+                      .filter(DailySeries.day <= last_day)}
+
+            series = []
+            day = first_day
+            while day <= last_day:
+                row = stored.get(day)
+                series.append({
+                    'period_key': period_key('day', day),
+                    'date': day,
+                    'received': row.received if row else 0,
+                    'sent': row.sent if row else 0,
+                    'received_rate': row.received_rate if row else None,
+                    'sent_rate': row.sent_rate if row else None,
+                    'interpolated': period_key('day', day) not in observed
+                })
+                day += timedelta(days=1)
+            return series
+        finally:
+            session.close()
+
+    def rebuild_baselines(self):
+        """Rebuild partner_baseline for every account from referral_snapshot_row"""
+        session = self.Session()
+        try:
+            session.query(PartnerBaseline).delete(synchronize_session=False)
+            accounts = [a[0] for a in session.query(ReferralData.account_name).distinct().all()]
+            total = 0
+            for account_name in accounts:
+                total += self._refresh_baselines(session, account_name)
+            session.commit()
+            return total
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def get_baselines(self, account_names, start_date=None, end_date=None):
+        """Get {(account, partner, direction): (value, date)} of the first non-zero values in a range.
+
+        Reads partner_baseline, and only scans referral_snapshot_row (as of start_date) for pairs
+        whose stored baseline predates the range. Pairs without a non-zero value in range are left out.
+        """
+        session = self.Session()
+        try:
+            baselines = {}
+            stale_accounts = set()
+            for baseline in session.query(PartnerBaseline).filter(PartnerBaseline.account_name.in_(list(account_names))):
+                date = as_naive(baseline.date)
+                if start_date is not None and date < start_date:
+                    stale_accounts.add(baseline.account_name)
+                elif end_date is None or date <= end_date:
+                    baselines[(baseline.account_name, baseline.partner, baseline.direction)] = (baseline.value, baseline.date)
+            if stale_accounts:
+                for account_name, partner, direction, _, date, value in \
+                        self._first_nonzero_rows(session, stale_accounts, start_date, end_date):
+                    baselines[(account_name, partner, direction)] = (value, date)
+            return baselines
+        finally:
+            session.close()
+
+    def get_latest_snapshots(self, account_name=None):
+        """Get the latest snapshot of one or all accounts without touching history"""
+        session = self.Session()
+        try:
+            query = session.query(LatestSnapshot)
+            if account_name:
+                query = query.filter(LatestSnapshot.account_name == account_name)
+            return query.order_by(LatestSnapshot.date.desc()).all()
+        finally:
+            session.close()
+
+    def get_period_partner_totals(self, start_date, end_date, account_name=None):
+        """Sum each partner's received and sent values over every snapshot between start_date and end_date.
+
+        Aggregated in the database from referral_snapshot_row; returns {partner: {'received', 'sent'}}
+        in order of the partner's first appearance, like iterating the snapshots' JSON lists.
+        """
+        row = ReferralSnapshotRow
+        group = (row.partner, row.direction)
+        ranked = select(
+            row.partner,
+            row.direction,
+            row.date,
+            row.snapshot_id,
+            row.position,
+            func.coalesce(func.sum(row.subscribers).over(partition_by=group), 0).label('total'),
+            func.row_number().over(partition_by=group,
+                                   order_by=(row.date, row.snapshot_id, row.position)).label('appearance')
+        ).where(row.date.between(start_date, end_date))
+        if account_name:
+            ranked = ranked.where(row.account_name == account_name)
+        ranked = ranked.subquery()
+
+        session = self.Session()
+        try:
+            firsts = session.execute(
+                select(ranked.c.partner, ranked.c.direction, ranked.c.total,
+                       ranked.c.date, ranked.c.snapshot_id, ranked.c.position)
+                .where(ranked.c.appearance == 1)
+            ).all()
+        finally:
+            session.close()
+
+        # First appearance: earliest snapshot by date (then id), its recommending_me list before my_recommendations
+        first_seen = {}
+        for partner, direction, _, date, snapshot_id, position in firsts:
+            key = (date, snapshot_id, direction != 'received', position)
+            first_seen[partner] = min(first_seen.get(partner, key), key)
+        totals = {partner: {'received': 0, 'sent': 0} for partner in sorted(first_seen, key=first_seen.get)}
+        for partner, direction, total, _, _, _ in firsts:
+            totals[partner][direction] = total
+        return totals
+
+    def refresh_partner_recommendations(self, now=None):
+        """Recompute and store the ranked recommendations of every account with recent data"""
+        from .recommendations import build_recommendations, RECOMMENDATION_WINDOW_DAYS
+
+        started = time.time()
+        end_date = now or datetime.now()
+        start_date = end_date - timedelta(days=RECOMMENDATION_WINDOW_DAYS)
+        session = self.Session()
+        try:
+            data_version = self.get_data_versions([DATA_VERSION_ALL])[DATA_VERSION_ALL][0]
+            window = session.query(ReferralData)\
+                .filter(ReferralData.date.between(start_date, end_date))\
+                .order_by(ReferralData.date.desc())\
+                .all()
+            accounts = list(dict.fromkeys(record.account_name for record in window))
+
+            session.query(PartnerRecommendation).delete(synchronize_session=False)
+            session.query(RecommendationSummary).delete(synchronize_session=False)
+            stored = 0
+            for account_name in accounts:
+                records = [r for r in window if r.account_name == account_name]
+                other_records = [r for r in window if r.account_name != account_name]
+                result = build_recommendations(account_name, records, other_records)
+                session.add(RecommendationSummary(
+                    account_name=account_name,
+                    your_avg_volume=result['metrics']['your_avg_volume'],
+                    top_partners=result['metrics']['top_partners'],
+                    data_version=data_version,
+                    window_start=start_date,
+                    window_end=end_date
+                ))
+                for rank, rec in enumerate(result['recommendations'], start=1):
+                    session.add(PartnerRecommendation(
+                        account_name=account_name,
+                        rank=rank,
+                        partner=rec['partner'],
+                        monthly_volume=rec['monthly_volume'],
+                        partner_type=rec['type'],
+                        client=rec['client'],
+                        current_partnerships=rec['current_partnerships'],
+                        example_partnership=rec['example_partnership'],
+                        volume_match=rec['volume_match']
+                    ))
+                    stored += 1
+            session.commit()
+
+            elapsed = time.time() - started
+            print(f"Refreshed {stored} recommendations for {len(accounts)} accounts in {elapsed:.2f}s")
+            return {'accounts': len(accounts), 'recommendations': stored, 'seconds': elapsed}
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def get_stored_recommendations(self, account_name):
+        """Get an account's precomputed recommendations payload, or None if missing or outdated"""
+        session = self.Session()
+        try:
+            summary = session.get(RecommendationSummary, account_name)
+            current = self.get_data_versions([DATA_VERSION_ALL])[DATA_VERSION_ALL][0]
+            if summary is None or summary.data_version != current:
+                return None
+            rows = session.query(PartnerRecommendation)\
+                .filter(PartnerRecommendation.account_name == account_name)\
+                .order_by(PartnerRecommendation.rank)\
+                .all()
+            return {
+                'recommendations': [{
+                    'partner': row.partner,
+                    'monthly_volume': row.monthly_volume,
+                    'current_partnerships': row.current_partnerships,
+                    'volume_match': row.volume_match,
+                    'example_partnership': row.example_partnership,
+                    'type': row.partner_type,
+                    'client': row.client
+                } for row in rows],
+                'metrics': {
+                    'your_avg_volume': summary.your_avg_volume,
+                    'top_partners': summary.top_partners
+                }
+            }
+        finally:
+            session.close()
+
+    def get_partner_graph(self):
+        """Get the account↔partner graph of the latest snapshots, rebuilt whenever the data version changes"""
+        from .partner_graph import PartnerGraph
+
+        versions = self.get_data_versions([DATA_VERSION_ALL, DATA_VERSION_MAINTENANCE])
+        version = (versions[DATA_VERSION_ALL][0], versions[DATA_VERSION_MAINTENANCE][0])
+        if self._partner_graph is None or self._partner_graph_version != version:
+            self._partner_graph = PartnerGraph(self.get_latest_snapshots())
+            self._partner_graph_version = version
+        return self._partner_graph
+
+    def get_volume_index(self, days=30):
+        """Get the volume band index of every partner over the last days, rebuilt when the data changes"""
+        from .volume_index import VolumeBandIndex
+
+        versions = self.get_data_versions([DATA_VERSION_ALL, DATA_VERSION_MAINTENANCE])
+        end_date = datetime.now()
+        version = (versions[DATA_VERSION_ALL][0], versions[DATA_VERSION_MAINTENANCE][0], days, end_date.date())
+        if self._volume_index is None or self._volume_index_version != version:
+            session = self.Session()
+            try:
+                records = session.query(ReferralData)\
+                    .filter(ReferralData.date.between(end_date - timedelta(days=days), end_date))\
+                    .order_by(ReferralData.date.desc())\
+                    .all()
+            finally:
+                session.close()
+            self._volume_index = VolumeBandIndex.from_records(records)
+            self._volume_index_version = version
+        return self._volume_index
+
+    def get_rollup_periods(self, account_name, grain, start_date, end_date, partner=None):
+        """Get rollup periods of an account between start_date and end_date (inclusive), oldest first.
+
+        Periods that straddle the range boundaries are recomputed from the snapshots inside the
+        range, so results match aggregating the raw records. With a partner, received/sent are
+        that partner's peak values; otherwise they are the account totals at the period's last snapshot.
+        """
+        session = self.Session()
+        try:
+            stored = session.query(AccountRollup)\
+                .filter(AccountRollup.account_name == account_name)\
+                .filter(AccountRollup.grain == grain)\
+                .filter(AccountRollup.last_date >= start_date)\
+                .filter(AccountRollup.first_date <= end_date)\
+                .order_by(AccountRollup.period_key)\
+                .all()
+
+            inside = [r.period_key for r in stored
+                      if r.first_date >= start_date and r.last_date <= end_date]
+            partner_periods = {}
+            if partner is not None and inside:
+                partner_periods = {
+                    r.period_key: r for r in session.query(PartnerRollup)
+                        .filter(PartnerRollup.account_name == account_name)
+                        .filter(PartnerRollup.partner == partner)
+                        .filter(PartnerRollup.grain == grain)
+                        .filter(PartnerRollup.period_key.in_(inside))
+                }
+
+            periods = []
+            for rollup in stored:
+                if rollup.period_key in inside:
+                    period = {
+                        'period_key': rollup.period_key,
+                        'date': rollup.first_date,
+                        'received': rollup.received,
+                        'sent': rollup.sent,
+                        'received_rate': None,
+                        'sent_rate': None
+                    }
+                    if partner is not None:
+                        summary = partner_periods.get(rollup.period_key)
+                        period['received'] = summary.max_received if summary else 0
+                        period['sent'] = summary.max_sent if summary else 0
+                        period['received_rate'] = summary.received_rate if summary else None
+                        period['sent_rate'] = summary.sent_rate if summary else None
+                    periods.append(period)
+                    continue
+
+                # Boundary period: only aggregate the snapshots inside the requested range
+                bounds_start, bounds_end = period_bounds(grain, rollup.first_date)
+                snapshots, rows = self._load_rollup_inputs(
+                    session, account_name,
+                    max(start_date, bounds_start), min(end_date, bounds_end - timedelta(microseconds=1)),
+                    partner=partner, end_inclusive=True
+                )
+                accounts, partners = self._summarize_periods(grain, snapshots, rows)
+                account = accounts.get(rollup.period_key)
+                if not account:
+                    continue
+                period = {
+                    'period_key': rollup.period_key,
+                    'date': account['first_date'],
+                    'received': account['received'],
+                    'sent': account['sent'],
+                    'received_rate': None,
+                    'sent_rate': None
+                }
+                if partner is not None:
+                    summary = partners.get((rollup.period_key, partner), {})
+                    period['received'] = summary.get('max_received', 0)
+                    period['sent'] = summary.get('max_sent', 0)
+                    period['received_rate'] = summary.get('received_rate')
+                    period['sent_rate'] = summary.get('sent_rate')
+                periods.append(period)
+            return periods
+        finally:
+            session.close()
+
+    def backfill_snapshot_rows(self, batch_size=500):
+        """Rebuild referral_snapshot_row from the existing ReferralData JSON columns"""
+        session = self.Session()
+        try:
+            session.query(ReferralSnapshotRow).delete(synchronize_session=False)
+            total_records = 0
+            total_rows = 0
+            last_id = 0
+            while True:
+                batch = session.query(ReferralData)\
+                    .filter(ReferralData.id > last_id)\
+                    .order_by(ReferralData.id)\
+                    .limit(batch_size)\
+                    .all()
+                if not batch:
+                    break
+                for record in batch:
+                    total_rows += self._write_snapshot_rows(session, record)
+                total_records += len(batch)
+                last_id = batch[-1].id
+                session.commit()
+                session.expunge_all()
+                print(f"Backfilled {total_records} records ({total_rows} partner rows)")
+            return total_records, total_rows
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def normalize_historical_data(self, batch_size=500):
+        """One-off migration: rewrite string subscribers/conversion rates in existing records as numbers"""
+        session = self.Session()
+        try:
+            checked = 0
+            updated = 0
+            last_id = 0
+            while True:
+                batch = session.query(ReferralData)\
+                    .filter(ReferralData.id > last_id)\
+                    .order_by(ReferralData.id)\
+                    .limit(batch_size)\
+                    .all()
+                if not batch:
+                    break
+                for record in batch:
+                    recommending_me = normalize_entries(record.recommending_me)
+                    my_recommendations = normalize_entries(record.my_recommendations)
+                    if recommending_me != record.recommending_me or my_recommendations != record.my_recommendations:
+                        record.recommending_me = recommending_me
+                        record.my_recommendations = my_recommendations
+                        updated += 1
+                checked += len(batch)
+                last_id = batch[-1].id
+                session.commit()
+                print(f"Checked {checked} records, normalized {updated}")
+            return checked, updated
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def partner_filter(self, partner, direction=None):
+        """Condition on ReferralData: partner is listed in recommending_me ('received'),
+        my_recommendations ('sent') or, without a direction, either list"""
+        dialect = self.engine.dialect.name
+        received = partner_listed(ReferralData.recommending_me, partner, dialect)
+        sent = partner_listed(ReferralData.my_recommendations, partner, dialect)
+        if direction == 'received':
+            return received
+        if direction == 'sent':
+            return sent
+        return received | sent
+
+    def get_records_with_partner(self, partner, account_name=None, start_date=None, end_date=None, direction=None):
+        """Get the ReferralData records listing a partner, oldest first, filtered inside the database"""
+        session = self.Session()
+        try:
+            query = session.query(ReferralData).filter(self.partner_filter(partner, direction))
+            if account_name:
+                query = query.filter(ReferralData.account_name == account_name)
+            if start_date:
+                query = query.filter(ReferralData.date >= start_date)
+            if end_date:
+                query = query.filter(ReferralData.date <= end_date)
+            return query.order_by(ReferralData.date).all()
+        finally:
+            session.close()
+
+    def get_partner_history(self, account_name, partner, start_date=None, end_date=None):
+        """Get one entry per snapshot of an account with a single partner's received/sent values.
+
+        Reads referral_snapshot_row instead of the JSON columns; snapshots where the
+        partner is missing report 0 subscribers and no conversion rate.
+        """
+        session = self.Session()
+        try:
+            snapshots = session.query(ReferralData.id, ReferralData.date)\
+                .filter(ReferralData.account_name == account_name)
+            rows = session.query(ReferralSnapshotRow)\
+                .filter(ReferralSnapshotRow.account_name == account_name)\
+                .filter(ReferralSnapshotRow.partner == partner)
+            if start_date:
+                snapshots = snapshots.filter(ReferralData.date >= start_date)
+                rows = rows.filter(ReferralSnapshotRow.date >= start_date)
+            if end_date:
+                snapshots = snapshots.filter(ReferralData.date <= end_date)
+                rows = rows.filter(ReferralSnapshotRow.date <= end_date)
+
+            # Keep the first entry per snapshot and direction, like next() over the JSON list
+            entries = {}
+            for row in rows.order_by(ReferralSnapshotRow.position).all():
+                entries.setdefault((row.snapshot_id, row.direction), row)
+
+            history = []
+            for snapshot_id, date in snapshots.order_by(ReferralData.date).all():
+                received = entries.get((snapshot_id, 'received'))
+                sent = entries.get((snapshot_id, 'sent'))
+                history.append({
+                    'snapshot_id': snapshot_id,
+                    'date': date,
+                    'received': received.subscribers if received else 0,
+                    'sent': sent.subscribers if sent else 0,
+                    'received_rate': received.conversion_rate if received else None,
+                    'sent_rate': sent.conversion_rate if sent else None,
+                    'has_received': received is not None,
+                    'has_sent': sent is not None
+                })
+            return history
+        finally:
+            session.close()
+
+    def get_partnership_metrics(self, start_date, end_date, account=None):
+        """Get /api/partnership-metrics rows for one account, or merged across accounts for 'all'.
+
+        Instead of loading every partner row in the range, reads each partner's first appearance,
+        the rows of each account's last snapshot and the persisted baselines.
+        """
+        session = self.Session()
+        try:
+            snapshots = session.query(ReferralData.id, ReferralData.date, ReferralData.account_name)\
+                .filter(ReferralData.date >= start_date)\
+                .filter(ReferralData.date <= end_date)
+            if account and account != 'all':
+                snapshots = snapshots.filter(ReferralData.account_name == account)
+            snapshots = snapshots.order_by(ReferralData.date, ReferralData.id).all()
+            if not snapshots:
+                return []
+
+            account_ids = {}
+            last_snapshot = {}
+            for snapshot_id, _, account_name in snapshots:
+                account_ids.setdefault(account_name, len(account_ids))
+                last_snapshot[account_name] = snapshot_id
+            account_names = list(account_ids)
+            counts = np.bincount([account_ids[s.account_name] for s in snapshots], minlength=len(account_names))
+
+            # First appearance of each partner per account, in JSON scan order
+            scan_order = (ReferralSnapshotRow.date, ReferralSnapshotRow.snapshot_id,
+                          ReferralSnapshotRow.direction, ReferralSnapshotRow.position)
+            ranked = session.query(
+                ReferralSnapshotRow.account_name,
+                ReferralSnapshotRow.partner,
+                ReferralSnapshotRow.date,
+                ReferralSnapshotRow.snapshot_id,
+                ReferralSnapshotRow.direction,
+                ReferralSnapshotRow.position,
+                func.row_number().over(
+                    partition_by=(ReferralSnapshotRow.account_name, ReferralSnapshotRow.partner),
+                    order_by=scan_order
+                ).label('rank')
+            ).filter(ReferralSnapshotRow.date >= start_date)\
+             .filter(ReferralSnapshotRow.date <= end_date)\
+             .filter(ReferralSnapshotRow.account_name.in_(account_names))\
+             .subquery()
+            first_rows = session.query(ranked.c.account_name, ranked.c.partner)\
+                .filter(ranked.c.rank == 1)\
+                .order_by(ranked.c.date, ranked.c.snapshot_id, ranked.c.direction, ranked.c.position)\
+                .all()
+            if not first_rows:
+                return []
+
+            partner_ids = {}
+            for _, partner in first_rows:
+                partner_ids.setdefault(partner, len(partner_ids))
+            shape = (len(account_names), len(partner_ids))
+            appears = np.zeros(shape, dtype=bool)
+            first_seen = np.zeros(shape, dtype=np.int64)
+            for rank, (account_name, partner) in enumerate(first_rows):
+                a, p = account_ids[account_name], partner_ids[partner]
+                appears[a, p] = True
+                first_seen[a, p] = rank
+
+            # First entry per partner and direction in each account's last snapshot
+            end_value = np.zeros((len(DIRECTIONS),) + shape, dtype=np.int64)
+            seen = set()
+            for row in session.query(ReferralSnapshotRow.account_name, ReferralSnapshotRow.partner,
+                                     ReferralSnapshotRow.direction, ReferralSnapshotRow.subscribers)\
+                    .filter(ReferralSnapshotRow.snapshot_id.in_(list(last_snapshot.values())))\
+                    .order_by(ReferralSnapshotRow.position):
+                key = (row.account_name, row.partner, row.direction)
+                if key not in seen:
+                    seen.add(key)
+                    end_value[DIRECTIONS.index(row.direction), account_ids[row.account_name],
+                              partner_ids[row.partner]] = row.subscribers or 0
+        finally:
+            session.close()
+
+        baseline_value = np.zeros(end_value.shape, dtype=np.int64)
+        baseline_date = np.empty(end_value.shape, dtype=object)
+        for (account_name, partner, direction), (value, date) in \
+                self.get_baselines(account_names, start_date, end_date).items():
+            cell = (DIRECTIONS.index(direction), account_ids[account_name], partner_ids[partner])
+            baseline_value[cell] = value
+            baseline_date[cell] = date
+        return assemble_partnership_metrics(account_names, list(partner_ids), counts, appears, first_seen,
+                                            end_value, baseline_value, baseline_date, account)
+
     def get_latest_data(self, account_name=None):
         """Get latest data for one or all accounts"""
         session = self.Session()
@@ -123,28 +1560,28 @@ class DatabaseManager:
             
             # Process period metrics (calculate changes)
             earliest_received_map = {
-                rec['creator']: int(rec.get('subscribers', '0').replace(',', ''))
+                rec['creator']: rec.get('subscribers', 0)
                 for rec in earliest_period_record.recommending_me
                 if rec['creator'].lower() != 'convertkit'
             }
             print(f"\nEarliest received map: {earliest_received_map}")
             
             earliest_sent_map = {
-                rec['creator']: int(rec.get('subscribers', '0').replace(',', ''))
+                rec['creator']: rec.get('subscribers', 0)
                 for rec in earliest_period_record.my_recommendations
                 if rec['creator'].lower() != 'convertkit'
             }
             print(f"Earliest sent map: {earliest_sent_map}")
             
             latest_received_map = {
-                rec['creator']: int(rec.get('subscribers', '0').replace(',', ''))
+                rec['creator']: rec.get('subscribers', 0)
                 for rec in latest_period_record.recommending_me
                 if rec['creator'].lower() != 'convertkit'
             }
             print(f"Latest received map: {latest_received_map}")
             
             latest_sent_map = {
-                rec['creator']: int(rec.get('subscribers', '0').replace(',', ''))
+                rec['creator']: rec.get('subscribers', 0)
                 for rec in latest_period_record.my_recommendations
                 if rec['creator'].lower() != 'convertkit'
             }
@@ -183,6 +1620,7 @@ class DatabaseManager:
 
         finally:
             session.close()
+
     def get_earliest_data_date(self):
         """Get the earliest date in the database"""
         session = self.Session()
@@ -193,130 +1631,75 @@ class DatabaseManager:
 
     def get_largest_imbalances(self, start_date=None, end_date=None):
         """Get the largest referral imbalances across all accounts"""
+        print("\n=== Starting get_largest_imbalances ===")
+        print(f"Start date: {start_date}, End date: {end_date}")
+        
         session = self.Session()
         try:
-            print("\n=== Starting get_largest_imbalances ===")
-            print(f"Start date: {start_date}, End date: {end_date}")
-            
-            # Get the latest record for each unique account
-            subquery = session.query(
-                ReferralData.account_name,
-                func.max(ReferralData.date).label('max_date')
-            ).group_by(ReferralData.account_name).subquery()
-
-            query = session.query(ReferralData).join(
-                subquery,
-                (ReferralData.account_name == subquery.c.account_name) &
-                (ReferralData.date == subquery.c.max_date)
-            )
-
-            if start_date:
-                query = query.filter(ReferralData.date >= start_date)
-            if end_date:
-                query = query.filter(ReferralData.date <= end_date)
-            
-            latest_data = query.all()
-            print(f"Found {len(latest_data)} records")
-            
-            # Process all partnerships to find biggest imbalances
-            imbalances = []
-            
-            for record in latest_data:
-                print(f"Processing record for account: {record.account_name}")
-                # Process "recommending me" entries
-                received_map = {rec['creator']: int(rec.get('subscribers', '0').replace(',', '')) 
-                              for rec in record.recommending_me}
-                print(f"Received map: {received_map}")
-                
-                # Process "my recommendations" entries
-                sent_map = {rec['creator']: int(rec.get('subscribers', '0').replace(',', '')) 
-                           for rec in record.my_recommendations}
-                print(f"Sent map: {sent_map}")
-                
-                # Calculate imbalances
-                for partner in set(list(received_map.keys()) + list(sent_map.keys())):
-                    received = received_map.get(partner, 0)
-                    sent = sent_map.get(partner, 0)
-                    imbalance = received - sent
-                    
-                    # Only add if there's an actual imbalance
-                    if imbalance != 0:
-                        imbalances.append({
-                            'account': record.account_name,
-                            'partner': partner,
-                            'received': received,
-                            'sent': sent,
-                            'imbalance': imbalance,
-                            'abs_imbalance': abs(imbalance)
-                        })
-            
-            # Sort by absolute imbalance and get top 10
-            sorted_imbalances = sorted(imbalances, key=lambda x: x['abs_imbalance'], reverse=True)[:10]
-            print(f"Returning {len(sorted_imbalances)} imbalances")
-            return sorted_imbalances
+            if supports_json_aggregation(session):
+                # Unnest and compare the latest snapshots inside the database
+                imbalances = json_aggregates.largest_imbalances(session, start_date, end_date)
+                print(f"Returning {len(imbalances)} imbalances")
+                return imbalances
         finally:
             session.close()
 
-    def convert_data_format(self, df):
-        """Convert DataFrame to database format"""
-        results = []
+        # Latest snapshot of each account, kept current on ingest; ties keep ingest order
+        latest_data = sorted(self.get_latest_snapshots(), key=lambda r: r.snapshot_id)
+        if start_date:
+            latest_data = [r for r in latest_data if r.date >= start_date]
+        if end_date:
+            latest_data = [r for r in latest_data if r.date <= end_date]
+        print(f"Found {len(latest_data)} records")
         
-        # Group by account_name and date
-        for account_name in df['account_name'].unique():
-            account_df = df[df['account_name'] == account_name]
+        # Process all partnerships to find biggest imbalances
+        imbalances = []
+        
+        for record in latest_data:
+            print(f"Processing record for account: {record.account_name}")
+            # Process "recommending me" entries
+            received_map = {rec['creator']: rec.get('subscribers', 0) 
+                          for rec in record.recommending_me}
+            print(f"Received map: {received_map}")
             
-            for date in account_df['date'].unique():
-                date_df = account_df[account_df['date'] == date]
-                
-                # Get recommending_me data
-                recommending = date_df[date_df['tab'] == 'recommending_me']
-                recommending_list = [
-                    {
-                        'creator': row['creator'],
-                        'subscribers': row['subscribers'],
-                        'conversion_rate': row['conversion_rate']
-                    }
-                    for _, row in recommending.iterrows()
-                ]
-                
-                # Get my_recommendations data
-                recommendations = date_df[date_df['tab'] == 'my_recommendations']
-                recommendations_list = [
-                    {
-                        'creator': row['creator'],
-                        'subscribers': row['subscribers'],
-                        'conversion_rate': row['conversion_rate']
-                    }
-                    for _, row in recommendations.iterrows()
-                ]
+            # Process "my recommendations" entries
+            sent_map = {rec['creator']: rec.get('subscribers', 0) 
+                       for rec in record.my_recommendations}
+            print(f"Sent map: {sent_map}")
+            
+            # Calculate imbalances
+            for partner in set(list(received_map.keys()) + list(sent_map.keys())):
+                received = received_map.get(partner, 0)
+                sent = sent_map.get(partner, 0)
+                imbalance = received - sent
                 
-                # Add to results
-                results.append({
-                    'date': datetime.strptime(str(date), '%Y-%m-%d') if len(str(date)) == 10 else datetime.strptime(str(date), '%Y-%m-%d %H:%M:%S'),
-                    'account_name': account_name,
-                    'recommending_me': recommending_list,
-                    'my_recommendations': recommendations_list
-                })
+                # Only add if there's an actual imbalance
+                if imbalance != 0:
+                    imbalances.append({
+                        'account': record.account_name,
+                        'partner': partner,
+                        'received': received,
+                        'sent': sent,
+                        'imbalance': imbalance,
+                        'abs_imbalance': abs(imbalance)
+                    })
         
-        return results
+        # Sort by absolute imbalance and get top 10
+        sorted_imbalances = sorted(imbalances, key=lambda x: x['abs_imbalance'], reverse=True)[:10]
+        print(f"Returning {len(sorted_imbalances)} imbalances")
+        return sorted_imbalances
+
+    def convert_data_format(self, df):
+        """Convert DataFrame to database format"""
+        from .csv_import import snapshots_from_frame
+        return snapshots_from_frame(df)
 
     def import_csv(self, csv_path='data/referral_data.csv'):
         """Import data from CSV file into database"""
-        # Read CSV file
-        df = pd.read_csv(csv_path)
-        
-        # Convert data to the right format
-        data_to_import = self.convert_data_format(df)
-        
-        # Import each record
-        for record in data_to_import:
-            self.save_data(
-                account_name=record['account_name'],
-                recommending_me=record['recommending_me'],
-                my_recommendations=record['my_recommendations']
-            )
-        
+        from .csv_import import import_csv
+        stats = import_csv(self, csv_path)
         print("Data imported successfully!")
+        return stats
 
     def create_html_viewer(self):
         """Create HTML viewer with avatars"""
@@ -399,17 +1782,12 @@ class DatabaseManager:
 
     def get_account_trends(self, account_name, start_date, end_date):
         """Get trend data for a specific account over the specified date range"""
-        session = self.Session()
         try:
             print(f"DB: Getting trends for {account_name} from {start_date} to {end_date}")
             
-            records = session.query(ReferralData)\
-                .filter(ReferralData.account_name == account_name)\
-                .filter(ReferralData.date.between(start_date, end_date))\
-                .order_by(ReferralData.date.asc())\
-                .all()
+            periods = self.get_rollup_periods(account_name, 'day', start_date, end_date)
             
-            print(f"DB: Found {len(records)} records")
+            print(f"DB: Found {len(periods)} daily rollups")
             
             trend_data = {
                 'dates': [],
@@ -418,23 +1796,15 @@ class DatabaseManager:
                 'balance': []
             }
             
-            if not records:
+            if not periods:
                 print(f"DB: No records found for {account_name} in the specified date range")
                 return trend_data
             
-            for record in records:
-                try:
-                    # Calculate total received and sent for this date
-                    received = sum(int(rec.get('subscribers', 0)) for rec in record.recommending_me or [])
-                    sent = sum(int(rec.get('subscribers', 0)) for rec in record.my_recommendations or [])
-                    
-                    trend_data['dates'].append(record.date.strftime('%Y-%m-%d'))
-                    trend_data['received'].append(received)
-                    trend_data['sent'].append(sent)
-                    trend_data['balance'].append(received - sent)
-                except Exception as e:
-                    print(f"DB: Error processing record {record.id}: {str(e)}")
-                    # Continue with next record
+            for period in periods:
+                trend_data['dates'].append(period['period_key'])
+                trend_data['received'].append(period['received'])
+                trend_data['sent'].append(period['sent'])
+                trend_data['balance'].append(period['received'] - period['sent'])
             
             print(f"DB: Processed {len(trend_data['dates'])} data points")
             return trend_data
@@ -448,43 +1818,41 @@ class DatabaseManager:
                 'sent': [],
                 'balance': []
             }
-        finally:
-            session.close()
 
     def calculate_growth_metrics(self, account_name, start_date, end_date):
-        """Calculate growth metrics comparing start and end of period"""
+        """Calculate growth metrics comparing start and end of period.
+
+        Returns (subscriber, conversion, earnings) growth in percent: the account's received subscribers
+        per snapshot and average received conversion rate over the first 3 days against the last 3 days.
+        Earnings are not scraped, so their growth is always 0.
+        """
         session = self.Session()
         try:
-            # Get start period metrics (average of first 3 days)
-            start_metrics = session.query(
-                func.avg(ReferralData.subscribers).label('start_subscribers'),
-                func.avg(ReferralData.conversions).label('start_conversions'),
-                func.avg(ReferralData.earnings).label('start_earnings')
-            ).filter(
-                ReferralData.account_name == account_name,
-                ReferralData.date.between(start_date, start_date + timedelta(days=2))
-            ).first()
-
-            # Get end period metrics (average of last 3 days)
-            end_metrics = session.query(
-                func.avg(ReferralData.subscribers).label('end_subscribers'),
-                func.avg(ReferralData.conversions).label('end_conversions'),
-                func.avg(ReferralData.earnings).label('end_earnings')
-            ).filter(
-                ReferralData.account_name == account_name,
-                ReferralData.date.between(end_date - timedelta(days=2), end_date)
-            ).first()
+            def period_metrics(start, end):
+                return session.query(
+                    (func.sum(ReferralSnapshotRow.subscribers) * 1.0 /
+                     func.count(func.distinct(ReferralSnapshotRow.snapshot_id))).label('subscribers'),
+                    func.avg(ReferralSnapshotRow.conversion_rate).label('conversions')
+                ).filter(
+                    ReferralSnapshotRow.account_name == account_name,
+                    ReferralSnapshotRow.direction == 'received',
+                    ReferralSnapshotRow.date.between(start, end)
+                ).first()
+
+            # Start period metrics (first 3 days) and end period metrics (last 3 days)
+            start_metrics = period_metrics(start_date, start_date + timedelta(days=2))
+            end_metrics = period_metrics(end_date - timedelta(days=2), end_date)
 
             # Calculate growth percentages
             def calculate_growth(start, end):
-                if not start or start == 0:
+                if not start or start == 0 or end is None:
                     return 0
                 return round(((end - start) / start) * 100, 2)
 
             return (
-                calculate_growth(start_metrics.start_subscribers, end_metrics.end_subscribers),
-                calculate_growth(start_metrics.start_conversions, end_metrics.end_conversions),
-                calculate_growth(start_metrics.start_earnings, end_metrics.end_earnings)
+                calculate_growth(start_metrics.subscribers, end_metrics.subscribers),
+                calculate_growth(start_metrics.conversions, end_metrics.conversions),
+                0
             )
         finally:
             session.close()
@@ -496,22 +1864,12 @@ class DatabaseManager:
             end_date = datetime.now()
             start_date = end_date - timedelta(days=days)
 
-            # Subquery to get first and last metrics for each account
-            account_metrics = session.query(
-                ReferralData.account_name,
-                func.min(ReferralData.date).label('first_date'),
-                func.max(ReferralData.date).label('last_date'),
-                func.avg(ReferralData.earnings).label('avg_earnings')
-            ).filter(
-                ReferralData.date.between(start_date, end_date)
-            ).group_by(ReferralData.account_name).subquery()
-
-            # Get accounts meeting minimum earnings threshold
-            qualified_accounts = session.query(
-                account_metrics.c.account_name
-            ).filter(
-                account_metrics.c.avg_earnings >= min_earnings
-            ).subquery()
+            # Accounts with data in the period; earnings are not scraped, so every account has 0
+            qualified_accounts = session.query(ReferralData.account_name)\
+                .filter(ReferralData.date.between(start_date, end_date))\
+                .filter(literal(0) >= min_earnings)\
+                .distinct()\
+                .subquery()
 
             # Calculate growth rates for qualified accounts
             growth_rates = []
@@ -540,93 +1898,68 @@ class DatabaseManager:
         Args:
             days: If provided, only look at data from last X days
         """
+        start_date = datetime.now() - timedelta(days=days) if days else None
         session = self.Session()
         try:
-            query = session.query(ReferralData)
-            if days:
-                start_date = datetime.now() - timedelta(days=days)
-                query = query.filter(ReferralData.date >= start_date)
-            
-            # Get latest records for each account
-            latest_records = query.order_by(ReferralData.date.desc()).all()
-            
-            # Process all partnerships
-            all_partnerships = []
-            for record in latest_records:
-                # Create a map of received subscribers
-                received_map = {}
-                for rec in record.recommending_me:
-                    if rec['creator'].lower() != 'convertkit':
-                        received_map[rec['creator']] = int(rec.get('subscribers', '0').replace(',', ''))
-                
-                # Process sent subscribers and calculate imbalances
-                for rec in record.my_recommendations:
-                    if rec['creator'].lower() != 'convertkit':
-                        partner = rec['creator']
-                        sent = int(rec.get('subscribers', '0').replace(',', ''))
-                        received = received_map.get(partner, 0)
-                        balance = received - sent
-                        
-                        all_partnerships.append({
-                            'partner': partner,
-                            'client': record.account_name,
-                            'received': received,
-                            'sent': sent,
-                            'balance': balance
-                        })
-            
-            # Sort by worst performing (most negative balance) first
-            all_partnerships.sort(key=lambda x: x['balance'])
-            return all_partnerships[:10]  # Return top 10 worst performers
-            
+            if supports_json_aggregation(session):
+                # Unnest and compare the latest snapshots inside the database
+                return json_aggregates.worst_performers(session, start_date)
         finally:
             session.close()
 
+        # Latest snapshot of each account, kept current on ingest
+        latest_records = self.get_latest_snapshots()
+        if start_date:
+            latest_records = [r for r in latest_records if r.date >= start_date]
+        
+        # Process all partnerships
+        all_partnerships = []
+        for record in latest_records:
+            # Create a map of received subscribers
+            received_map = {}
+            for rec in record.recommending_me:
+                if rec['creator'].lower() != 'convertkit':
+                    received_map[rec['creator']] = rec.get('subscribers', 0)
+            
+            # Process sent subscribers and calculate imbalances
+            for rec in record.my_recommendations:
+                if rec['creator'].lower() != 'convertkit':
+                    partner = rec['creator']
+                    sent = rec.get('subscribers', 0)
+                    received = received_map.get(partner, 0)
+                    balance = received - sent
+                    
+                    all_partnerships.append({
+                        'partner': partner,
+                        'client': record.account_name,
+                        'received': received,
+                        'sent': sent,
+                        'balance': balance
+                    })
+        
+        # Sort by worst performing (most negative balance) first
+        all_partnerships.sort(key=lambda x: x['balance'])
+        return all_partnerships[:10]  # Return top 10 worst performers
+
     def get_partnership_trend(self, account_name, partner_name, start_date=None, end_date=None):
         """Get trend data for a specific partnership over time"""
-        session = self.Session()
-        try:
-            query = session.query(ReferralData).filter(
-                ReferralData.account_name == account_name
-            ).order_by(ReferralData.date.asc())
-            
-            if start_date:
-                query = query.filter(ReferralData.date >= start_date)
-            if end_date:
-                query = query.filter(ReferralData.date <= end_date)
-            
-            records = query.all()
-            
-            trend_data = {
-                'dates': [],
-                'received': [],
-                'sent': [],
-                'balance': []
-            }
-            
-            for record in records:
-                received = 0
-                for rec in record.recommending_me:
-                    if rec['creator'] == partner_name:
-                        received = int(rec.get('subscribers', '0').replace(',', ''))
-                        break
-                
-                sent = 0
-                for rec in record.my_recommendations:
-                    if rec['creator'] == partner_name:
-                        sent = int(rec.get('subscribers', '0').replace(',', ''))
-                        break
-                
-                trend_data['dates'].append(record.date.strftime('%Y-%m-%d'))
-                trend_data['received'].append(received)
-                trend_data['sent'].append(sent)
-                trend_data['balance'].append(received - sent)
-            
-            print(f"Trend data for {partner_name}: {trend_data}")  # Debug print
-            return trend_data
-            
-        finally:
-            session.close()
+        history = self.get_partner_history(account_name, partner_name, start_date, end_date)
+
+        trend_data = {
+            'dates': [],
+            'received': [],
+            'sent': [],
+            'balance': []
+        }
+
+        for entry in history:
+            trend_data['dates'].append(entry['date'].strftime('%Y-%m-%d'))
+            trend_data['received'].append(entry['received'])
+            trend_data['sent'].append(entry['sent'])
+            trend_data['balance'].append(entry['received'] - entry['sent'])
+
+        print(f"Trend data for {partner_name}: {trend_data}")  # Debug print
+        return trend_data
 
     def renderTableRow(self, row):
         partner_name = row['partner']  # or however you get the partner name
@@ -711,8 +2044,8 @@ class DatabaseManager:
                 
                 receiving.append({
                     "creator": partner,
-                    "subscribers": str(max(0, base_values[partner])),
-                    "conversion_rate": f"{random.uniform(1.5, 4.5):.1f}%"
+                    "subscribers": max(0, base_values[partner]),
+                    "conversion_rate": round(random.uniform(1.5, 4.5), 1)
                 })
             
             # Create sending partnerships (3-5 partners)
@@ -720,8 +2053,8 @@ class DatabaseManager:
                 base = base_values[partner]
                 sending.append({
                     "creator": partner,
-                    "subscribers": str(max(0, base - random.randint(50, 150))),
-                    "conversion_rate": f"{random.uniform(1.0, 3.5):.1f}%"
+                    "subscribers": max(0, base - random.randint(50, 150)),
+                    "conversion_rate": round(random.uniform(1.0, 3.5), 1)
                 })
             
             demo_record = ReferralData(
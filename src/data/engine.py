@@ -0,0 +1,38 @@
+import threading
+from sqlalchemy import create_engine
+from ..utils.config import DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE, DB_POOL_PRE_PING
+
+# One engine (and connection pool) per database URL for the whole process
+_engines = {}
+_prepared = {}
+_lock = threading.RLock()
+
+def pool_options(url):
+    """create_engine pool arguments from the DB_POOL_* settings; SQLite keeps its default pool size"""
+    options = {'pool_pre_ping': DB_POOL_PRE_PING, 'pool_recycle': DB_POOL_RECYCLE}
+    if not url.startswith('sqlite'):
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
+    return options
+
+def get_engine(url):
+    """The process-wide engine for url, created on first use"""
+    with _lock:
+        engine = _engines.get(url)
+        if engine is None:
+            engine = _engines[url] = create_engine(url, **pool_options(url))
+        return engine
+
+def prepare_once(engine, prepare):
+    """Run prepare(engine) the first time engine is prepared in this process; later calls return its result"""
+    with _lock:
+        if engine not in _prepared:
+            _prepared[engine] = prepare(engine)
+        return _prepared[engine]
+
+def dispose_engines():
+    """Close every pooled connection and forget the engines, e.g. in a worker process after fork"""
+    with _lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+        _prepared.clear()
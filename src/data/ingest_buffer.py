@@ -0,0 +1,216 @@
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+from datetime import datetime
+from sqlalchemy.exc import InterfaceError, OperationalError, TimeoutError
+from .db_manager import IngestReceipt
+
+INGEST_BATCH_SIZE = 50
+# Connection problems (including deadlocks and serialization failures) clear up on their own; any other
+# error is specific to the snapshot and would fail on every retry
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, TimeoutError)
+
+class IngestBuffer:
+    """Local SQLite (WAL) queue of scraped snapshots waiting for the central database.
+
+    enqueue() commits to a local file, so scraping never waits on, or fails with, the network.
+    sync() writes the queue to the central database in batches, one transaction each, and only
+    then removes them locally. Each snapshot's idempotency key is stored in ingest_receipt in
+    the same transaction, so a batch retried after a lost commit acknowledgement is skipped.
+    Snapshots that fail with a non-transient error are moved to dead_snapshot so they cannot
+    hold up the rest of the queue.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pending_snapshot (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    idempotency_key TEXT NOT NULL UNIQUE,
+                    account_name TEXT NOT NULL,
+                    scraped_at TEXT NOT NULL,
+                    recommending_me TEXT NOT NULL,
+                    my_recommendations TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS dead_snapshot (
+                    seq INTEGER PRIMARY KEY,
+                    idempotency_key TEXT NOT NULL UNIQUE,
+                    account_name TEXT NOT NULL,
+                    scraped_at TEXT NOT NULL,
+                    recommending_me TEXT NOT NULL,
+                    my_recommendations TEXT NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    last_error TEXT,
+                    failed_at TEXT NOT NULL
+                )
+            """)
+
+    def _connect(self):
+        """Connection that commits on leaving the with block and is then closed"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return _Transaction(conn)
+
+    def enqueue(self, account_name, recommending_me, my_recommendations, scraped_at):
+        """Queue a scraped snapshot; returns its idempotency key"""
+        key = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO pending_snapshot (idempotency_key, account_name, scraped_at, recommending_me, "
+                "my_recommendations) VALUES (?, ?, ?, ?, ?)",
+                (key, account_name, scraped_at.isoformat(), json.dumps(recommending_me), json.dumps(my_recommendations))
+            )
+        return key
+
+    def pending_count(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM pending_snapshot").fetchone()[0]
+
+    def dead_count(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM dead_snapshot").fetchone()[0]
+
+    def latest(self, account_name):
+        """The account's most recently queued snapshot as a dict, None if nothing is pending"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT scraped_at, recommending_me, my_recommendations FROM pending_snapshot "
+                "WHERE account_name = ? ORDER BY seq DESC LIMIT 1", (account_name,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'date': datetime.fromisoformat(row[0]),
+            'recommending_me': json.loads(row[1]),
+            'my_recommendations': json.loads(row[2])
+        }
+
+    def sync(self, db, batch_size=INGEST_BATCH_SIZE, retries=3, retry_delay=5):
+        """Write queued snapshots to db oldest first, retrying a failed batch with exponential backoff.
+
+        A batch failing with a non-transient error is retried one snapshot at a time, and the snapshots
+        that still fail are moved to dead_snapshot. Stops at a transient error that persists after
+        retries, keeping the failing snapshots and everything after them queued.
+        Returns {'synced', 'batches', 'dead', 'pending', 'error'}.
+        """
+        synced = 0
+        batches = 0
+        dead = 0
+        while True:
+            with self._connect() as conn:
+                batch = conn.execute(
+                    "SELECT seq, idempotency_key, account_name, scraped_at, recommending_me, my_recommendations "
+                    "FROM pending_snapshot ORDER BY seq LIMIT ?", (batch_size,)
+                ).fetchall()
+            if not batch:
+                return {'synced': synced, 'batches': batches, 'dead': dead, 'pending': 0, 'error': None}
+
+            error = self._apply_with_retries(db, batch, retries, retry_delay)
+            if error is None:
+                self._remove(batch)
+                synced += len(batch)
+            elif isinstance(error, TRANSIENT_ERRORS):
+                return {'synced': synced, 'batches': batches, 'dead': dead, 'pending': self.pending_count(),
+                        'error': str(error)}
+            else:
+                # Find the bad snapshots instead of retrying the whole batch forever
+                for row in batch:
+                    error = self._apply_with_retries(db, [row], retries, retry_delay)
+                    if error is None:
+                        self._remove([row])
+                        synced += 1
+                    elif isinstance(error, TRANSIENT_ERRORS):
+                        return {'synced': synced, 'batches': batches, 'dead': dead,
+                                'pending': self.pending_count(), 'error': str(error)}
+                    else:
+                        self._bury(row[0], error)
+                        dead += 1
+            batches += 1
+            print(f"Ingest sync: {synced} snapshots written, {dead} moved to dead_snapshot ({batches} batches)")
+
+    def _apply_with_retries(self, db, batch, retries, retry_delay):
+        """Apply a batch, retrying transient errors with exponential backoff; returns the last error or None"""
+        for attempt in range(1, retries + 1):
+            try:
+                self._apply(db, batch)
+                return None
+            except Exception as e:
+                with self._connect() as conn:
+                    conn.executemany(
+                        "UPDATE pending_snapshot SET attempts = attempts + 1, last_error = ? WHERE seq = ?",
+                        [(str(e), row[0]) for row in batch]
+                    )
+                print(f"Ingest sync: batch of {len(batch)} failed (attempt {attempt}/{retries}): {str(e)}")
+                if not isinstance(e, TRANSIENT_ERRORS) or attempt == retries:
+                    return e
+                time.sleep(retry_delay * 2 ** (attempt - 1))
+
+    def _remove(self, batch):
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM pending_snapshot WHERE seq = ?", [(row[0],) for row in batch])
+
+    def _bury(self, seq, error):
+        """Move a snapshot that cannot be written to dead_snapshot, keeping it for inspection"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO dead_snapshot (seq, idempotency_key, account_name, scraped_at, recommending_me, "
+                "my_recommendations, attempts, last_error, failed_at) "
+                "SELECT seq, idempotency_key, account_name, scraped_at, recommending_me, my_recommendations, "
+                "attempts, last_error, ? FROM pending_snapshot WHERE seq = ?",
+                (datetime.utcnow().isoformat(), seq)
+            )
+            conn.execute("DELETE FROM pending_snapshot WHERE seq = ?", (seq,))
+        print(f"Ingest sync: moved snapshot {seq} to dead_snapshot: {str(error)}")
+
+    def _apply(self, db, batch):
+        """Write one batch in a single central transaction, skipping keys that were already received"""
+        session = db.Session()
+        try:
+            keys = [row[1] for row in batch]
+            received = {key for (key,) in session.query(IngestReceipt.idempotency_key)
+                        .filter(IngestReceipt.idempotency_key.in_(keys))}
+            for _, key, account_name, scraped_at, recommending_me, my_recommendations in batch:
+                if key in received:
+                    continue
+                record = db.store_snapshot(session, account_name, datetime.fromisoformat(scraped_at),
+                                           json.loads(recommending_me), json.loads(my_recommendations))
+                session.add(IngestReceipt(
+                    idempotency_key=key,
+                    account_name=account_name,
+                    snapshot_id=record.id if record else None,
+                    received_at=datetime.utcnow()
+                ))
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+class _Transaction:
+    """sqlite3 connection as a context manager that commits (or rolls back) and closes"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        with closing(self.conn):
+            if exc_type is None:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
@@ -0,0 +1,17 @@
+import numpy as np
+
+_MAX_EXACT = 2 ** 53  # Larger values are interpolated with Python ints and floats
+
+def interpolate_values(prev_values, next_values, progress):
+    """int(prev + (next - prev) * step) for each progress step, as one list of values per step.
+
+    The per-value arithmetic of interpolate_missing_days, for all partners and days of a gap at once.
+    """
+    progress = np.asarray(progress, dtype=float)
+    if all(abs(v) < _MAX_EXACT for v in prev_values + next_values):
+        prev_array = np.array(prev_values, dtype=np.int64)
+        next_array = np.array(next_values, dtype=np.int64)
+        # Same float operations as the Python expression, truncated towards zero
+        return (prev_array + (next_array - prev_array) * progress[:, None]).astype(np.int64).tolist()
+    return [[int(prev + (nxt - prev) * step) for prev, nxt in zip(prev_values, next_values)]
+            for step in progress.tolist()]
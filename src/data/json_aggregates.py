@@ -0,0 +1,132 @@
+from sqlalchemy import text, bindparam, DateTime, exists, func, literal, select, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+
+JSON_DIALECTS = ('sqlite', 'postgresql')
+
+def supports_json_aggregation(session):
+    """Whether the session's database can unnest the JSON snapshot lists in SQL"""
+    return session.get_bind().dialect.name in JSON_DIALECTS
+
+def partner_listed(column, partner, dialect):
+    """SQL condition: the JSON list in column has an entry for partner.
+
+    PostgreSQL uses JSONB containment (column @> '[{"creator": partner}]'), which the GIN
+    indexes on referral_data serve; SQLite checks the list with json_each.
+    """
+    if dialect == 'postgresql':
+        return type_coerce(column, JSONB).contains([{'creator': partner}])
+    entries = func.json_each(column).table_valued('value').alias('entries')
+    return exists(select(literal(1)).select_from(entries)
+                  .where(func.json_extract(entries.c.value, '$.creator') == partner))
+
+def _entries(dialect, column):
+    """SELECT of one row per entry of latest_snapshot.<column>:
+    account_name, snapshot_id, date, partner, subscribers, position"""
+    if dialect == 'postgresql':
+        return f"""
+            SELECT ls.account_name, ls.snapshot_id, ls.date,
+                   e.value ->> 'creator' AS partner,
+                   COALESCE(CAST(e.value ->> 'subscribers' AS INTEGER), 0) AS subscribers,
+                   e.position - 1 AS position
+            FROM latest_snapshot ls
+            CROSS JOIN LATERAL jsonb_array_elements(CAST(ls.{column} AS jsonb)) WITH ORDINALITY AS e(value, position)
+        """
+    return f"""
+        SELECT ls.account_name, ls.snapshot_id, ls.date,
+               json_extract(e.value, '$.creator') AS partner,
+               COALESCE(CAST(json_extract(e.value, '$.subscribers') AS INTEGER), 0) AS subscribers,
+               CAST(e.key AS INTEGER) AS position
+        FROM latest_snapshot ls, json_each(ls.{column}) AS e
+    """
+
+def _last_entries(dialect, column):
+    """Like _entries, keeping only the last entry per account and partner (dict() semantics)"""
+    return f"""
+        SELECT * FROM (
+            SELECT entries.*, ROW_NUMBER() OVER (
+                PARTITION BY account_name, partner ORDER BY position DESC
+            ) AS duplicate
+            FROM ({_entries(dialect, column)}) entries
+        ) ranked
+        WHERE duplicate = 1
+    """
+
+def _query(sql, params):
+    """text() with datetime parameters bound as DateTime, so SQLite compares them in the stored format"""
+    query = text(sql)
+    for name in ('start_date', 'end_date'):
+        if name in params:
+            query = query.bindparams(bindparam(name, type_=DateTime))
+    return query
+
+def _date_filters(column, start_date, end_date):
+    filters, params = [], {}
+    if start_date:
+        filters.append(f"{column} >= :start_date")
+        params['start_date'] = start_date
+    if end_date:
+        filters.append(f"{column} <= :end_date")
+        params['end_date'] = end_date
+    return (' AND '.join(filters) if filters else '1 = 1'), params
+
+def largest_imbalances(session, start_date=None, end_date=None, limit=10):
+    """Largest received-sent gaps per account and partner in the latest snapshots, summed in SQL"""
+    dialect = session.get_bind().dialect.name
+    where, params = _date_filters('p.date', start_date, end_date)
+    query = f"""
+        WITH received AS ({_last_entries(dialect, 'recommending_me')}),
+             sent AS ({_last_entries(dialect, 'my_recommendations')}),
+             partners AS (
+                 SELECT account_name, snapshot_id, date, partner, MIN(position) AS position, MIN(side) AS side
+                 FROM (
+                     SELECT account_name, snapshot_id, date, partner, position, 0 AS side FROM received
+                     UNION ALL
+                     SELECT account_name, snapshot_id, date, partner, position, 1 AS side FROM sent
+                 ) listed
+                 GROUP BY account_name, snapshot_id, date, partner
+             )
+        SELECT p.account_name, p.partner,
+               COALESCE(r.subscribers, 0) AS received,
+               COALESCE(s.subscribers, 0) AS sent
+        FROM partners p
+        LEFT JOIN received r ON r.account_name = p.account_name AND r.partner = p.partner
+        LEFT JOIN sent s ON s.account_name = p.account_name AND s.partner = p.partner
+        WHERE {where} AND COALESCE(r.subscribers, 0) <> COALESCE(s.subscribers, 0)
+        ORDER BY ABS(COALESCE(r.subscribers, 0) - COALESCE(s.subscribers, 0)) DESC,
+                 p.snapshot_id, p.side, p.position
+        LIMIT :limit
+    """
+    params['limit'] = limit
+    return [{
+        'account': account_name,
+        'partner': partner,
+        'received': received,
+        'sent': sent,
+        'imbalance': received - sent,
+        'abs_imbalance': abs(received - sent)
+    } for account_name, partner, received, sent in session.execute(_query(query, params), params)]
+
+def worst_performers(session, start_date=None, limit=10):
+    """Most negative received-sent balances of every sent entry in the latest snapshots, in SQL"""
+    dialect = session.get_bind().dialect.name
+    where, params = _date_filters('s.date', start_date, None)
+    query = f"""
+        WITH received AS ({_last_entries(dialect, 'recommending_me')}),
+             sent AS ({_entries(dialect, 'my_recommendations')})
+        SELECT s.account_name, s.partner,
+               COALESCE(r.subscribers, 0) AS received,
+               s.subscribers AS sent
+        FROM sent s
+        LEFT JOIN received r ON r.account_name = s.account_name AND r.partner = s.partner
+        WHERE {where} AND LOWER(s.partner) <> 'convertkit'
+        ORDER BY COALESCE(r.subscribers, 0) - s.subscribers, s.date DESC, s.position
+        LIMIT :limit
+    """
+    params['limit'] = limit
+    return [{
+        'partner': partner,
+        'client': account_name,
+        'received': received,
+        'sent': sent,
+        'balance': received - sent
+    } for account_name, partner, received, sent in session.execute(_query(query, params), params)]
@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+from sqlalchemy import Integer, String, case, cast, extract, func, or_, select
+from .db_manager import ReferralData, as_naive
+
+CLEANUP_BATCH_SIZE = 500
+
+def period_bucket(dialect, grain, column):
+    """SQL expression equal to period_key(grain, column) for 'day' and 'week' on SQLite and PostgreSQL"""
+    if dialect == 'sqlite':
+        return func.strftime('%Y-%m-%d' if grain == 'day' else '%Y-%W', column)
+    if dialect == 'postgresql':
+        if grain == 'day':
+            return func.to_char(column, 'YYYY-MM-DD')
+        # %W: weeks start on Monday, days before the year's first Monday are week 00
+        week = cast(func.floor((extract('doy', column) + 7 - extract('isodow', column)) / 7), Integer)
+        return func.to_char(column, 'YYYY') + '-' + func.lpad(cast(week, String), 2, '0')
+    raise RuntimeError(f"snapshot compaction is not supported on {dialect}")
+
+def compaction_snapshots(dialect, daily_before, weekly_before):
+    """SELECT of the ids compaction removes: snapshots older than daily_before keep only the last one
+    per account and day, those older than weekly_before only the last one per account and week ('%Y-%W')"""
+    bucket = case(
+        (ReferralData.date < weekly_before, period_bucket(dialect, 'week', ReferralData.date)),
+        else_=period_bucket(dialect, 'day', ReferralData.date)
+    )
+    ranked = select(
+        ReferralData.id,
+        func.row_number().over(
+            partition_by=(ReferralData.account_name, bucket),
+            order_by=(ReferralData.date.desc(), ReferralData.id.desc())
+        ).label('period_rank')
+    ).where(ReferralData.date < daily_before).subquery()
+    return select(ranked.c.id).where(ranked.c.period_rank > 1)
+
+def compact_snapshots(db, daily_after_days=30, weekly_after_days=365, batch_size=500, dry_run=False, now=None):
+    """Delete intraday duplicates past daily_after_days and downsample to weekly past weekly_after_days.
+
+    The snapshots to keep are ranked inside the database; deletes go through delete_snapshots in
+    batches of batch_size. Returns {'checked', 'candidates', 'deleted', 'batches'}.
+    """
+    now = as_naive(now or datetime.now())
+    daily_before = now - timedelta(days=daily_after_days)
+    weekly_before = now - timedelta(days=max(weekly_after_days, daily_after_days))
+
+    session = db.Session()
+    try:
+        checked = session.query(func.count(ReferralData.id)).filter(ReferralData.date < daily_before).scalar()
+    finally:
+        session.close()
+    print(f"Compaction: checking {checked} snapshots before {daily_before:%Y-%m-%d}")
+    stats = delete_snapshots(db, compaction_snapshots(db.engine.dialect.name, daily_before, weekly_before),
+                             batch_size, dry_run, label='Compaction')
+    return dict(stats, checked=checked)
+
+def duplicate_snapshots():
+    """SELECT of the ids of every snapshot but the last one per account and day"""
+    ranked = select(
+        ReferralData.id,
+        func.row_number().over(
+            partition_by=(ReferralData.account_name, func.date(ReferralData.date)),
+            order_by=(ReferralData.date.desc(), ReferralData.id.desc())
+        ).label('day_rank')
+    ).subquery()
+    return select(ranked.c.id).where(ranked.c.day_rank > 1)
+
+def initial_data_snapshots(db):
+    """SELECT of the ids of Chris Donnelly's snapshots with partial data for newly added partners:
+    Dan Murray-Serter received before Dec 2, and Benchmark in either list on Dec 2"""
+    return select(ReferralData.id)\
+        .where(ReferralData.account_name == 'Chris Donnelly')\
+        .where(or_(
+            (ReferralData.date < datetime(2024, 12, 2)) & db.partner_filter('Dan Murray-Serter', 'received'),
+            (ReferralData.date >= datetime(2024, 12, 2)) & (ReferralData.date < datetime(2024, 12, 3))
+            & db.partner_filter('Benchmark')
+        ))
+
+def delete_snapshots(db, ids_query, batch_size=CLEANUP_BATCH_SIZE, dry_run=False, label='Cleanup'):
+    """Delete the snapshots selected by ids_query in the database, batch_size ids at a time.
+
+    The ids never leave the database: each batch is one DELETE ... WHERE id IN (ids_query ... LIMIT
+    batch_size) per table through DatabaseManager.delete_selected and a commit, so derived tables stay
+    in sync and locks are released between batches. dry_run only counts.
+    Returns {'candidates', 'deleted', 'batches'}.
+    """
+    session = db.Session()
+    try:
+        candidates = session.execute(select(func.count()).select_from(ids_query.subquery())).scalar()
+        print(f"{label}: {candidates} snapshots to remove")
+        if dry_run:
+            return {'candidates': candidates, 'deleted': 0, 'batches': 0}
+
+        batch_query = select(ids_query.subquery().c.id).order_by('id').limit(batch_size)
+        deleted = 0
+        batches = 0
+        while deleted < candidates:
+            try:
+                count = db.delete_selected(session, batch_query)
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+            if not count:
+                break
+            deleted += count
+            batches += 1
+            print(f"{label}: deleted {deleted}/{candidates} snapshots ({batches} batches)")
+        return {'candidates': candidates, 'deleted': deleted, 'batches': batches}
+    finally:
+        session.close()
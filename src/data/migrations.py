@@ -0,0 +1,179 @@
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from .db_manager import Base, ReferralData, SchemaVersion
+from .maintenance import delete_snapshots, duplicate_snapshots
+from .partitioning import is_partitioned
+
+# Manual migrations change or delete data and only run from the CLI (scripts/migrate.py upgrade --manual),
+# except on a new database where there is nothing to change
+Migration = namedtuple('Migration', 'version description apply manual')
+
+SNAPSHOT_DAY_KEY = 'ix_referral_data_account_day'
+UPDATED_AT_INDEX = 'ix_referral_data_updated_at'
+SNAPSHOT_DAY_SQL = {
+    'postgresql': "to_char(date, 'YYYY-MM-DD')",
+    'sqlite': "strftime('%Y-%m-%d', date)",
+}
+
+def _create_tables(db):
+    Base.metadata.create_all(db.engine)
+
+def _add_snapshot_day(db):
+    if 'snapshot_day' not in {c['name'] for c in inspect(db.engine).get_columns('referral_data')}:
+        with db.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE referral_data ADD COLUMN snapshot_day VARCHAR(10)"))
+
+def _create_indexes(db):
+    """Create model indexes missing on tables that existed before the index was added"""
+    postgresql = db.engine.dialect.name == 'postgresql'
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name == SNAPSHOT_DAY_KEY:
+                continue  # Needs same-day duplicates removed first, see _snapshot_day_key
+            if index.name == UPDATED_AT_INDEX:
+                continue  # Created with its column, see _add_updated_at
+            if index.dialect_options['postgresql']['using'] == 'gin' and not postgresql:
+                continue
+            index.create(db.engine, checkfirst=True)
+
+def _snapshot_day_key(db):
+    """Remove same-day duplicates, backfill snapshot_day and add the unique (account, day) key"""
+    dialect = db.engine.dialect.name
+    if dialect not in SNAPSHOT_DAY_SQL:
+        raise RuntimeError(f"snapshot upserts are not supported on {dialect}")
+    with db.engine.connect() as conn:
+        if dialect == 'postgresql' and is_partitioned(conn, 'referral_data'):
+            raise RuntimeError("referral_data is partitioned by month; PostgreSQL cannot enforce an "
+                               "(account, day) key without the partition column")
+    delete_snapshots(db, duplicate_snapshots(), label='Same-day duplicates')
+    with db.engine.begin() as conn:
+        conn.execute(text(
+            f"UPDATE referral_data SET snapshot_day = {SNAPSHOT_DAY_SQL[dialect]} WHERE snapshot_day IS NULL"
+        ))
+    for index in ReferralData.__table__.indexes:
+        if index.name == SNAPSHOT_DAY_KEY:
+            index.create(db.engine, checkfirst=True)
+
+def _add_updated_at(db):
+    if 'updated_at' not in {c['name'] for c in inspect(db.engine).get_columns('referral_data')}:
+        with db.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE referral_data ADD COLUMN updated_at TIMESTAMP"))
+    for index in ReferralData.__table__.indexes:
+        if index.name == UPDATED_AT_INDEX:
+            index.create(db.engine, checkfirst=True)
+
+def _has_snapshots(db):
+    with db.engine.connect() as conn:
+        return conn.execute(select(ReferralData.id).limit(1)).first() is not None
+
+def _normalize_values(db):
+    """Rewrite "1,234" / "13.89%" strings stored before ingest converted them to numbers"""
+    if not _has_snapshots(db):
+        return
+    checked, updated = db.normalize_historical_data()
+    print(f"Normalized {updated} of {checked} records")
+    if updated:
+        db.rebuild_latest_snapshots()  # Holds copies of the JSON lists
+        db.bump_maintenance_version()
+
+def _backfill_derived_tables(db):
+    """Build the tables derived from referral_data for the records saved before they existed"""
+    if not _has_snapshots(db):
+        return
+    records, rows = db.backfill_snapshot_rows()
+    print(f"Backfilled {rows} partner rows for {records} records")
+    db.rebuild_rollups()
+    db.rebuild_latest_snapshots()
+    db.rebuild_baselines()
+    if db.materialize_daily_series:
+        db.rebuild_daily_series()
+    db.bump_maintenance_version()
+
+MIGRATIONS = [
+    Migration(1, 'Create tables', _create_tables, False),
+    Migration(2, 'Add referral_data.snapshot_day', _add_snapshot_day, False),
+    Migration(3, 'Create indexes missing on existing tables', _create_indexes, False),
+    Migration(4, 'Remove same-day duplicates and add the unique (account, day) snapshot key', _snapshot_day_key, True),
+    Migration(5, 'Create ingest_receipt', _create_tables, False),
+    Migration(6, 'Add referral_data.updated_at', _add_updated_at, False),
+    Migration(7, 'Store string subscribers and conversion rates as numbers', _normalize_values, True),
+    Migration(8, 'Backfill snapshot rows, rollups, latest snapshots and baselines', _backfill_derived_tables, True),
+]
+SNAPSHOT_DAY_KEY_VERSION = 4
+MIGRATION_LOCK_KEY = 7202304  # pg_advisory_lock key held while a process migrates
+
+def applied_versions(engine):
+    """Versions recorded in schema_version, None if the table does not exist yet; a single query"""
+    try:
+        with engine.connect() as conn:
+            return set(conn.execute(select(SchemaVersion.version)).scalars())
+    except DBAPIError:
+        # Only a missing table means "not migrated yet"; connection and auth errors propagate,
+        # either from here or from connecting again for the check
+        with engine.connect() as conn:
+            if inspect(conn).has_table(SchemaVersion.__tablename__):
+                raise
+        return None
+
+def prepare_partitioning(conn, table, drop_snapshot_day_key=False):
+    """Check, in the partitioning transaction, that converting table keeps the keys applied migrations rely on.
+
+    Partitioning referral_data drops the unique (account, day) key of migration 4 that snapshot upserts
+    need, so it is refused while that migration is applied. drop_snapshot_day_key unrecords the migration
+    instead, and processes go back to plain inserts when they restart.
+    """
+    if table != ReferralData.__tablename__:
+        return
+    recorded = SchemaVersion.__table__.c.version == SNAPSHOT_DAY_KEY_VERSION
+    if conn.execute(select(SchemaVersion.version).where(recorded)).first() is None:
+        return
+    if not drop_snapshot_day_key:
+        raise RuntimeError(f"migration {SNAPSHOT_DAY_KEY_VERSION} is applied and snapshot upserts need its unique "
+                           f"(account, day) key, which a partitioned {table} cannot keep")
+    conn.execute(SchemaVersion.__table__.delete().where(recorded))
+    print(f"Unrecorded migration {SNAPSHOT_DAY_KEY_VERSION}: snapshots are inserted again after a restart")
+
+def pending(applied, include_manual=False):
+    return [m for m in MIGRATIONS if m.version not in (applied or set()) and (include_manual or not m.manual)]
+
+@contextmanager
+def _migration_lock(engine):
+    """Serialize upgrades across processes on PostgreSQL, where the web and clock processes boot together"""
+    if engine.dialect.name != 'postgresql':
+        yield
+        return
+    with engine.connect() as conn:
+        conn.execute(select(func.pg_advisory_lock(MIGRATION_LOCK_KEY)))
+        try:
+            yield
+        finally:
+            conn.execute(select(func.pg_advisory_unlock(MIGRATION_LOCK_KEY)))
+
+def upgrade(db, include_manual=False):
+    """Apply the pending migrations in order, recording each in schema_version. Returns the applied versions"""
+    engine = db.engine
+    with _migration_lock(engine):
+        new_database = not inspect(engine).has_table('referral_data')
+        SchemaVersion.__table__.create(engine, checkfirst=True)
+        applied = applied_versions(engine)  # Read under the lock: another process may have just migrated
+        for migration in pending(applied, include_manual or new_database):
+            print(f"Applying migration {migration.version}: {migration.description}")
+            migration.apply(db)
+            try:
+                with engine.begin() as conn:
+                    conn.execute(SchemaVersion.__table__.insert(),
+                                 {'version': migration.version, 'applied_at': datetime.utcnow()})
+            except IntegrityError:
+                pass  # Recorded by a process migrating without the lock (SQLite)
+            applied.add(migration.version)
+    return applied
+
+def prepare(db):
+    """Startup check: one query when the schema is current, otherwise apply the automatic migrations"""
+    applied = applied_versions(db.engine)
+    if applied is None or pending(applied):
+        applied = upgrade(db)
+    return applied
@@ -0,0 +1,123 @@
+import re
+from datetime import datetime
+from sqlalchemy import text
+
+# Tables range-partitioned by month on PostgreSQL, with their partition column
+PARTITIONED_TABLES = {
+    'referral_data': 'date',
+    'referral_snapshot_row': 'date',
+}
+PARTITION_MONTHS_AHEAD = 2
+
+def month_start(date):
+    return datetime(date.year, date.month, 1)
+
+def next_month(date):
+    return datetime(date.year + 1, 1, 1) if date.month == 12 else datetime(date.year, date.month + 1, 1)
+
+def partition_name(table, month):
+    return f"{table}_{month:%Y_%m}"
+
+def is_partitioned(conn, table):
+    """Whether table exists as a partitioned (PARTITION BY) table"""
+    return bool(conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"
+    ), {'table': table}).scalar())
+
+def create_month_partition(conn, table, month):
+    """Create the partition of table holding [month, next month) if it does not exist"""
+    name = partition_name(table, month)
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month(month):%Y-%m-%d}')"
+    ))
+    return name
+
+def ensure_partitions(engine, months_ahead=PARTITION_MONTHS_AHEAD, now=None):
+    """Create this month's and the next months_ahead partitions of every partitioned table.
+
+    Returns the partition names checked; a no-op on other databases or unpartitioned tables.
+    """
+    if engine.dialect.name != 'postgresql':
+        return []
+    month = month_start(now or datetime.now())
+    months = [month]
+    for _ in range(months_ahead):
+        months.append(next_month(months[-1]))
+
+    created = []
+    with engine.begin() as conn:
+        for table in PARTITIONED_TABLES:
+            if is_partitioned(conn, table):
+                created.extend(create_month_partition(conn, table, m) for m in months)
+    return created
+
+def list_partitions(conn, table):
+    """(name, month) of the monthly partitions attached to table, oldest first"""
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :table"
+    ), {'table': table}).scalars()
+    pattern = re.compile(rf"^{re.escape(table)}_(\d{{4}})_(\d{{2}})$")
+    partitions = []
+    for name in names:
+        match = pattern.match(name)
+        if match:
+            partitions.append((name, datetime(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda p: p[1])
+
+def detach_partitions_before(engine, cutoff):
+    """Detach the monthly partitions that end on or before cutoff; the detached tables are kept.
+
+    Detaching is a catalog change, so archiving a month does not rewrite or scan its rows.
+    """
+    if engine.dialect.name != 'postgresql':
+        return []
+    detached = []
+    with engine.begin() as conn:
+        for table in PARTITIONED_TABLES:
+            if not is_partitioned(conn, table):
+                continue
+            for name, month in list_partitions(conn, table):
+                if next_month(month) <= cutoff:
+                    conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+                    detached.append(name)
+    return detached
+
+def partition_table(conn, table, column, indexes=()):
+    """Convert an existing table into a monthly range-partitioned table with the same rows.
+
+    The primary key becomes (id, column), as PostgreSQL requires the partition key in it.
+    Rows are copied into one partition per month present; a DEFAULT partition catches rows
+    for months without a partition yet. Indexes are recreated on the parent and inherited
+    by the partitions, except unique ones without the partition column, which PostgreSQL
+    cannot enforce on a partitioned table.
+    """
+    indexes = [index for index in indexes if not index.unique or column in index.columns]
+    old = f"{table}_unpartitioned"
+    conn.execute(text(f"ALTER TABLE {table} RENAME TO {old}"))
+    conn.execute(text(f"ALTER TABLE {old} DROP CONSTRAINT IF EXISTS {table}_pkey"))
+    for index in indexes:
+        conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+    conn.execute(text(
+        f"CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS) PARTITION BY RANGE ({column})"
+    ))
+    conn.execute(text(f"ALTER TABLE {table} ADD PRIMARY KEY (id, {column})"))
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+
+    months = conn.execute(text(
+        f"SELECT DISTINCT date_trunc('month', {column}) FROM {old} WHERE {column} IS NOT NULL"
+    )).scalars().all()
+    for month in months:
+        create_month_partition(conn, table, month_start(month))
+
+    conn.execute(text(f"INSERT INTO {table} SELECT * FROM {old}"))
+    # Keep the id sequence when the old table is dropped
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {'table': old}).scalar()
+    if sequence:
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id"))
+    conn.execute(text(f"DROP TABLE {old}"))
+    for index in indexes:
+        index.create(conn)
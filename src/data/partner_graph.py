@@ -0,0 +1,101 @@
+import numpy as np
+
+GRAPH_DIRECTIONS = ('received', 'sent')  # recommending_me, my_recommendations
+
+class CSRMatrix:
+    """Minimal compressed sparse row matrix: row i's columns are indices[indptr[i]:indptr[i+1]]"""
+    __slots__ = ('indptr', 'indices', 'data', 'shape')
+
+    def __init__(self, rows, cols, data, shape):
+        order = np.lexsort((cols, rows))
+        self.indices = cols[order]
+        self.data = data[order]
+        self.indptr = np.zeros(shape[0] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=shape[0]), out=self.indptr[1:])
+        self.shape = shape
+
+    def row(self, i):
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return self.indices[start:end], self.data[start:end]
+
+class PartnerGraph:
+    """Bipartite account↔partner adjacency built from ReferralData-like snapshots.
+
+    Each direction is stored twice, as an account×partner CSR matrix and its partner×account
+    transpose, weighted by subscriber volume. When several snapshots of an account are
+    given, an edge exists if the partner appears in any of them and keeps the largest volume.
+    """
+
+    def __init__(self, records):
+        self.accounts = []
+        self.partners = []
+        self._account_ids = {}
+        self._partner_ids = {}
+        edges = {direction: {} for direction in GRAPH_DIRECTIONS}
+        for record in records:
+            a = self._intern(self._account_ids, self.accounts, record.account_name)
+            for direction, entries in zip(GRAPH_DIRECTIONS, (record.recommending_me, record.my_recommendations)):
+                for rec in entries or []:
+                    p = self._intern(self._partner_ids, self.partners, rec['creator'])
+                    volume = rec.get('subscribers', 0) or 0
+                    edges[direction][(a, p)] = max(edges[direction].get((a, p), 0), volume)
+
+        shape = (len(self.accounts), len(self.partners))
+        self._by_account = {}
+        self._by_partner = {}
+        for direction, weighted in edges.items():
+            pairs = np.array(list(weighted.keys()), dtype=np.int64).reshape(-1, 2)
+            weights = np.array(list(weighted.values()), dtype=np.int64)
+            self._by_account[direction] = CSRMatrix(pairs[:, 0], pairs[:, 1], weights, shape)
+            self._by_partner[direction] = CSRMatrix(pairs[:, 1], pairs[:, 0], weights, shape[::-1])
+
+    @staticmethod
+    def _intern(ids, names, name):
+        i = ids.get(name)
+        if i is None:
+            i = ids[name] = len(names)
+            names.append(name)
+        return i
+
+    def partners_of(self, account_name, direction='sent'):
+        """(partner, volume) pairs of an account; 'sent' follows my_recommendations, 'received' recommending_me"""
+        a = self._account_ids.get(account_name)
+        if a is None:
+            return []
+        indices, data = self._by_account[direction].row(a)
+        return [(self.partners[p], int(v)) for p, v in zip(indices, data)]
+
+    def accounts_for(self, partner, direction='received'):
+        """(account, volume) pairs of the accounts connected to a partner in the given direction.
+
+        'received' answers "which clients does X recommend", 'sent' answers "who sends to X".
+        """
+        p = self._partner_ids.get(partner)
+        if p is None:
+            return []
+        indices, data = self._by_partner[direction].row(p)
+        return [(self.accounts[a], int(v)) for a, v in zip(indices, data)]
+
+    def co_partners(self, account_name, direction='sent'):
+        """Other accounts sharing partners with an account, as (account, shared partner count), most shared first"""
+        a = self._account_ids.get(account_name)
+        if a is None:
+            return []
+        partner_ids, _ = self._by_account[direction].row(a)
+        transpose = self._by_partner[direction]
+        neighbours = [transpose.row(p)[0] for p in partner_ids]
+        if not neighbours:
+            return []
+        counts = np.bincount(np.concatenate(neighbours), minlength=len(self.accounts))
+        counts[a] = 0
+        order = np.argsort(-counts, kind='stable')
+        return [(self.accounts[i], int(counts[i])) for i in order if counts[i] > 0]
+
+    def overlap(self, account_a, account_b, direction='sent'):
+        """Partners two accounts have in common"""
+        a, b = self._account_ids.get(account_a), self._account_ids.get(account_b)
+        if a is None or b is None:
+            return []
+        matrix = self._by_account[direction]
+        shared = np.intersect1d(matrix.row(a)[0], matrix.row(b)[0], assume_unique=True)
+        return [self.partners[p] for p in shared]
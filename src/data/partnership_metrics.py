@@ -0,0 +1,76 @@
+import numpy as np
+
+DIRECTIONS = ('received', 'sent')
+
+def _last_true(mask):
+    """Index of the last True along axis 0 of a 2D mask, plus whether any was True"""
+    return mask.shape[0] - 1 - np.argmax(mask[::-1], axis=0), mask.any(axis=0)
+
+def assemble_partnership_metrics(account_names, partner_names, counts, appears, first_seen,
+                                 end_value, baseline_value, baseline_date, account=None):
+    """Build the metrics rows from per-(account, partner) summaries of a date range.
+
+    counts: snapshots per account. appears: [account, partner] partner listed in any snapshot.
+    first_seen: [account, partner] sortable rank of the partner's first appearance in the account.
+    end_value: [direction, account, partner] first entry in the account's last snapshot, 0 if absent.
+    baseline_value / baseline_date: [direction, account, partner] first non-zero value in the
+    range and its snapshot date; 0 / None without one.
+    """
+    n_partners = len(partner_names)
+    partners = np.arange(n_partners)[None, :]
+
+    # Only accounts with more than one snapshot in the range count
+    qualifying = counts > 1
+    appears = appears & qualifying[:, None]
+    has_baseline = (baseline_value > 0) & qualifying[None, :, None]
+    period_value = np.where(has_baseline, end_value - baseline_value, 0)
+
+    def baseline(d, a, p):
+        if not has_baseline[d, a, p]:
+            return None
+        return {
+            'value': int(baseline_value[d, a, p]),
+            'date': baseline_date[d, a, p]
+        }
+
+    if account == 'all':
+        # One row per partner: baselines from the first account that has it, period values
+        # from the last account with a baseline and latest values from the last account
+        present = appears.any(axis=0)
+        first_account = np.argmax(appears, axis=0)
+        last_account, _ = _last_true(appears)
+        period = []
+        for d in range(len(DIRECTIONS)):
+            last_baseline, any_baseline = _last_true(has_baseline[d])
+            period.append(np.where(any_baseline, period_value[d][last_baseline, partners[0]], 0))
+        latest = end_value[:, last_account, partners[0]]
+
+        keep = np.flatnonzero(present)
+        keep = keep[np.lexsort((first_seen[first_account[keep], keep], first_account[keep]))]
+        entries = [(first_account[p], p, 'All Clients', period[0][p], period[1][p], latest[0, p], latest[1, p])
+                   for p in keep]
+    else:
+        keep_accounts, keep_partners = np.nonzero(appears)
+        order = np.lexsort((first_seen[keep_accounts, keep_partners], keep_accounts))
+        entries = [(a, p, account_names[a], period_value[0, a, p], period_value[1, a, p],
+                    end_value[0, a, p], end_value[1, a, p])
+                   for a, p in zip(keep_accounts[order], keep_partners[order])]
+
+    results = []
+    for a, p, label, period_received, period_sent, latest_received, latest_sent in entries:
+        results.append({
+            'partner': partner_names[p],
+            'account': label,
+            'period_received': int(period_received),
+            'period_sent': int(period_sent),
+            'latest_received': int(latest_received),
+            'latest_sent': int(latest_sent),
+            'baseline_received': baseline(0, a, p),
+            'baseline_sent': baseline(1, a, p),
+            'period_balance': int(period_received - period_sent),
+            'all_time_balance': int(latest_received - latest_sent)
+        })
+
+    # Sort by period balance, most negative first (stable, like list.sort)
+    balances = np.array([r['period_balance'] for r in results], dtype=np.int64)
+    return [results[i] for i in np.argsort(balances, kind='stable')]
@@ -0,0 +1,69 @@
+from .db_manager import SnapshotView
+from .partner_graph import PartnerGraph
+from .volume_index import VolumeBandIndex
+
+RECOMMENDATION_WINDOW_DAYS = 30
+RECOMMENDATION_LIMIT = 10
+
+def build_recommendations(account, records, other_records):
+    """Rank partners with a monthly volume within ±25% of the account's top-3 sent average.
+
+    records: the account's snapshots in the window, newest first.
+    other_records: every other account's snapshots in the window, newest first.
+    Returns the /api/partnership-recommendations payload, or None without records.
+    """
+    if not records:
+        return None
+
+    latest_view = SnapshotView(records[0])
+    earliest_view = SnapshotView(records[-1])  # Last record is earliest due to desc order
+
+    # Period change in sent volume for each current partner
+    partner_sent_values = {}
+    for partner in set(latest_view.sent_partners()):
+        period_sent = latest_view.sent(partner) - earliest_view.sent(partner)
+        if period_sent > 0:  # Only include positive period changes
+            partner_sent_values[partner] = period_sent
+
+    # Average of the top 3 sent volumes
+    sorted_partners = sorted(partner_sent_values.items(), key=lambda x: x[1], reverse=True)[:3]
+    sent_volumes = [sent for _, sent in sorted_partners]
+    raw_avg = sum(sent_volumes) / len(sent_volumes) if sent_volumes else 0
+
+    # Volume range (±25%)
+    min_volume = raw_avg * 0.75
+    max_volume = raw_avg * 1.25
+
+    # Partners within the volume range, excluding current partners and the account itself
+    current_partners = set(latest_view.sent_partners())
+    current_partners.add(account)
+    volume_index = VolumeBandIndex.from_records(other_records)
+    matching_partners = volume_index.find_partners_in_volume_band(min_volume, max_volume, exclude=current_partners)
+
+    # Which other accounts each partner is connected to, over the whole window
+    graph = PartnerGraph(other_records)
+    recommendations = []
+    for partner, data in matching_partners[:RECOMMENDATION_LIMIT]:
+        # Find partner's current partnerships
+        if data['type'] == 'creator':
+            partner_partnerships = {account_name for account_name, _ in graph.accounts_for(partner, 'received')}
+        else:  # client type
+            partner_partnerships = {creator for creator, _ in graph.partners_of(partner, 'received')}
+
+        recommendations.append({
+            'partner': partner,
+            'monthly_volume': data['volume'],
+            'current_partnerships': list(partner_partnerships),
+            'volume_match': f"{data['volume']:,} referrals/month (±25% of your volume)",
+            'example_partnership': next(iter(partner_partnerships)) if partner_partnerships else None,
+            'type': data['type'],
+            'client': data.get('client') if data['type'] == 'creator' else None
+        })
+
+    return {
+        'recommendations': recommendations,
+        'metrics': {
+            'your_avg_volume': round(raw_avg),  # Round the raw average for display
+            'top_partners': [p for p, _ in sorted_partners]
+        }
+    }
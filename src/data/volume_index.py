@@ -0,0 +1,64 @@
+from bisect import bisect_left, bisect_right
+
+class VolumeBandIndex:
+    """Partners sorted by monthly volume for O(log n + k) "similar volume" lookups.
+
+    Creators are measured by the most they sent to one of the given accounts ("Recommending
+    me"), client accounts by their largest total of "My Recommendations". A name seen both ways
+    keeps the largest volume and the kind of its last entry, like the original recommendation loop.
+    """
+
+    def __init__(self, volumes):
+        """volumes: {name: {'volume': int, 'type': 'creator' | 'client', ...}} in insertion order"""
+        self.entries = volumes
+        # Ascending volume with ties in reverse insertion order, so walking a band
+        # backwards yields descending volume with ties in insertion order.
+        # One sorted array for all entries and one per kind ('creator' received, 'client' sent)
+        ranked = sorted(enumerate(volumes.items()), key=lambda item: (item[1][1]['volume'], -item[0]))
+        self._bands = {None: ([], [])}
+        for _, (name, data) in ranked:
+            for kind in (None, data['type']):
+                names, sorted_volumes = self._bands.setdefault(kind, ([], []))
+                names.append(name)
+                sorted_volumes.append(data['volume'])
+
+    @classmethod
+    def from_records(cls, records):
+        """Build from ReferralData-like records, newest first"""
+        volumes = {}
+        for record in records:
+            for rec in record.recommending_me:
+                partner = rec['creator']
+                received = rec['subscribers']
+                if received > 0:
+                    volumes[partner] = {
+                        'volume': max(volumes.get(partner, {}).get('volume', 0), received),
+                        'type': 'creator',
+                        'client': record.account_name
+                    }
+
+            sent = [rec['subscribers'] for rec in record.my_recommendations if rec['subscribers'] > 0]
+            if sent:
+                volumes[record.account_name] = {
+                    'volume': max(volumes.get(record.account_name, {}).get('volume', 0), sum(sent)),
+                    'type': 'client',
+                    'active_partnerships': len(sent)
+                }
+        return cls(volumes)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def find_partners_in_volume_band(self, low, high, exclude=(), kind=None):
+        """(name, data) pairs with low <= volume <= high, highest volume first.
+
+        exclude: names to skip, e.g. current partners. kind: only 'creator' or 'client' entries.
+        """
+        names, volumes = self._bands.get(kind, ([], []))
+        start = bisect_left(volumes, low)
+        end = bisect_right(volumes, high)
+        matches = []
+        for i in range(end - 1, start - 1, -1):
+            if names[i] not in exclude:
+                matches.append((names[i], self.entries[names[i]]))
+        return matches
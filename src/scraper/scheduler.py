@@ -3,6 +3,10 @@ import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from src.scraper.convertkit_scraper import ConvertKitScraper
+from src.data.db_manager import DatabaseManager
+from src.data.maintenance import compact_snapshots
+from src.data.ingest_buffer import IngestBuffer
+from src.utils.config import COMPACT_DAILY_AFTER_DAYS, COMPACT_WEEKLY_AFTER_DAYS, BUFFER_INGEST, INGEST_BUFFER_PATH
 from datetime import datetime, timedelta
 import logging
 import json
@@ -96,6 +100,58 @@ class ScraperScheduler:
             logger.error(f"Error checking run schedule: {str(e)}")
             return True  # Run on error to be safe
 
+    def refresh_recommendations(self):
+        """Precompute partnership recommendations from the freshly scraped data"""
+        try:
+            stats = DatabaseManager().refresh_partner_recommendations()
+            logger.info(
+                f"Recommendation job: {stats['recommendations']} candidates for "
+                f"{stats['accounts']} accounts in {stats['seconds']:.2f}s"
+            )
+            return stats
+        except Exception as e:
+            logger.error(f"Recommendation job failed: {str(e)}", exc_info=True)
+            return None
+
+    def ensure_partitions(self):
+        """Create upcoming monthly partitions so new snapshots never land in the default partition"""
+        try:
+            names = DatabaseManager().ensure_partitions()
+            logger.info(f"Partition job: {len(names)} current/upcoming partitions checked")
+            return names
+        except Exception as e:
+            logger.error(f"Partition job failed: {str(e)}", exc_info=True)
+            return None
+
+    def compact_snapshots(self):
+        """Apply the snapshot retention policy (daily, then weekly) to old history"""
+        try:
+            stats = compact_snapshots(DatabaseManager(), COMPACT_DAILY_AFTER_DAYS, COMPACT_WEEKLY_AFTER_DAYS)
+            logger.info(f"Compaction job: deleted {stats['deleted']} of {stats['checked']} old snapshots "
+                        f"in {stats['batches']} batches")
+            return stats
+        except Exception as e:
+            logger.error(f"Compaction job failed: {str(e)}", exc_info=True)
+            return None
+
+    def sync_ingest_buffer(self):
+        """Write snapshots queued in the local ingest buffer to the central database"""
+        if not BUFFER_INGEST:
+            return None
+        try:
+            stats = IngestBuffer(INGEST_BUFFER_PATH).sync(DatabaseManager())
+            if stats['dead']:
+                logger.warning(f"Ingest sync: moved {stats['dead']} snapshots that cannot be written to dead_snapshot "
+                               f"in {INGEST_BUFFER_PATH}")
+            if stats['error']:
+                logger.error(f"Ingest sync stopped with {stats['pending']} snapshots queued: {stats['error']}")
+            elif stats['synced']:
+                logger.info(f"Ingest sync: wrote {stats['synced']} snapshots in {stats['batches']} batches")
+            return stats
+        except Exception as e:
+            logger.error(f"Ingest sync failed: {str(e)}", exc_info=True)
+            return None
+
     def run_scraper(self, force=False):
         """Run the scraper"""
         try:
@@ -160,6 +216,7 @@ class ScraperScheduler:
 
                     success = True
                     failed_accounts = []
+                    saved_accounts = []
                     
                     accounts = scraper.get_available_accounts()
                     for account in accounts:
@@ -185,6 +242,8 @@ class ScraperScheduler:
                             if not is_valid:
                                 failed_accounts.append(account['name'])
                                 success = False
+                            else:
+                                saved_accounts.append(account['name'])
                                 
                         except Exception as e:
                             logger.error(f"Failed to scrape {account['name']}: {str(e)}")
@@ -210,6 +269,12 @@ class ScraperScheduler:
 
                     # Save the state
                     self.save_last_run()
+                    self.sync_ingest_buffer()
+                    
+                    # Every ranking draws on other accounts' data, so refresh them all whenever any account
+                    # saved new data, even if others failed and will be retried
+                    if saved_accounts:
+                        self.refresh_recommendations()
                     
                     # Send appropriate notification
                     if not failed_accounts:
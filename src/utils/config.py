@@ -19,6 +19,36 @@ DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///data/referral_data.db')
 if DATABASE_URL.startswith('postgres://'):
     DATABASE_URL = DATABASE_URL.replace('postgres://', 'postgresql://', 1)
 
+# Connection pool shared by every DatabaseManager in a process (see src/data/engine.py)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))  # Seconds; reconnect before the server drops idle connections
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true')
+
+# Entries in the analytics response cache (src/utils/response_cache.py)
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 256))
+
+# Persist gap-filled daily partner series for the charts; backfill with scripts/rebuild_derived_data.py
+MATERIALIZE_DAILY_SERIES = os.getenv('MATERIALIZE_DAILY_SERIES', 'false').lower() in ('1', 'true')
+
+# Create upcoming monthly partitions on PostgreSQL (convert tables with scripts/partition_tables.py)
+PARTITION_BY_MONTH = os.getenv('PARTITION_BY_MONTH', 'false').lower() in ('1', 'true')
+
+# Also append every scrape to snapshot_history, including the intraday ones replaced in referral_data
+KEEP_INTRADAY_HISTORY = os.getenv('KEEP_INTRADAY_HISTORY', 'false').lower() in ('1', 'true')
+
+# Scraper writes go to a local SQLite queue first and are synced to DATABASE_URL in batches
+BUFFER_INGEST = os.getenv('BUFFER_INGEST', 'false').lower() in ('1', 'true')
+INGEST_BUFFER_PATH = os.getenv('INGEST_BUFFER_PATH', 'data/ingest_buffer.db')
+
+# Bulk CSV import: rows read per chunk and snapshots written per transaction
+CSV_IMPORT_CHUNK_ROWS = int(os.getenv('CSV_IMPORT_CHUNK_ROWS', 50000))
+CSV_IMPORT_BATCH_SIZE = int(os.getenv('CSV_IMPORT_BATCH_SIZE', 500))
+
+# Snapshot retention: keep one snapshot per account-day past the first horizon, one per week past the second
+COMPACT_DAILY_AFTER_DAYS = int(os.getenv('COMPACT_DAILY_AFTER_DAYS', 30))
+COMPACT_WEEKLY_AFTER_DAYS = int(os.getenv('COMPACT_WEEKLY_AFTER_DAYS', 365))
+
 # Slack settings (for notifications)
 SLACK_TOKEN = os.getenv('SLACK_TOKEN')
 SLACK_CHANNEL = os.getenv('SLACK_CHANNEL')
\ No newline at end of file
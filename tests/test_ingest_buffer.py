@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from src.data import db_manager
+from src.data.db_manager import IngestReceipt, ReferralData
+from src.data.ingest_buffer import IngestBuffer
+
+SCRAPED_AT = datetime(2024, 12, 1, 6)
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_manager, 'DATABASE_URL', f"sqlite:///{tmp_path / 'central.db'}")
+    return db_manager.DatabaseManager()
+
+@pytest.fixture
+def buffer(tmp_path):
+    return IngestBuffer(str(tmp_path / 'buffer' / 'ingest_buffer.db'))
+
+def enqueue(buffer, count):
+    return [buffer.enqueue(f"Account {i}", [{'creator': 'Partner', 'subscribers': i + 1}], [],
+                           SCRAPED_AT + timedelta(days=i))
+            for i in range(count)]
+
+def snapshot_count(db):
+    session = db.Session()
+    try:
+        return session.query(ReferralData).count()
+    finally:
+        session.close()
+
+def test_transient_failure_is_retried(db, buffer, monkeypatch):
+    enqueue(buffer, 3)
+    store_snapshot = db.store_snapshot
+    failures = []
+
+    def flaky_store_snapshot(*args):
+        if not failures:
+            failures.append(1)
+            raise OperationalError('INSERT', {}, Exception('server closed the connection unexpectedly'))
+        return store_snapshot(*args)
+
+    monkeypatch.setattr(db, 'store_snapshot', flaky_store_snapshot)
+    result = buffer.sync(db, retry_delay=0)
+
+    assert result == {'synced': 3, 'batches': 1, 'dead': 0, 'pending': 0, 'error': None}
+    assert failures == [1]
+    assert snapshot_count(db) == 3
+
+def test_persistent_transient_failure_keeps_the_queue(db, buffer, monkeypatch):
+    enqueue(buffer, 2)
+
+    def unreachable(*args):
+        raise OperationalError('INSERT', {}, Exception('could not connect to server'))
+
+    monkeypatch.setattr(db, 'store_snapshot', unreachable)
+    result = buffer.sync(db, retries=2, retry_delay=0)
+
+    assert result['synced'] == 0 and result['pending'] == 2 and result['error']
+    assert buffer.dead_count() == 0
+
+def test_permanent_failure_moves_the_snapshot_to_dead_snapshot(db, buffer):
+    keys = enqueue(buffer, 5)
+    with buffer._connect() as conn:
+        conn.execute("UPDATE pending_snapshot SET recommending_me = '{not json' WHERE idempotency_key = ?",
+                     (keys[2],))
+
+    result = buffer.sync(db, batch_size=3, retry_delay=0)
+
+    assert result['synced'] == 4 and result['dead'] == 1 and result['pending'] == 0
+    assert buffer.dead_count() == 1
+    with buffer._connect() as conn:
+        assert conn.execute("SELECT idempotency_key FROM dead_snapshot").fetchone()[0] == keys[2]
+    assert snapshot_count(db) == 4
+
+def test_replayed_batch_is_not_written_twice(db, buffer, monkeypatch):
+    """A batch committed centrally but still queued (lost acknowledgement) is skipped on the next sync"""
+    db.upsert_snapshots = False  # Without the day key a second write would add a second row
+    enqueue(buffer, 3)
+    with buffer._connect() as conn:
+        batch = conn.execute(
+            "SELECT seq, idempotency_key, account_name, scraped_at, recommending_me, my_recommendations "
+            "FROM pending_snapshot ORDER BY seq"
+        ).fetchall()
+    buffer._apply(db, batch)
+    assert buffer.pending_count() == 3
+
+    store_snapshot = db.store_snapshot
+    stored = []
+    monkeypatch.setattr(db, 'store_snapshot', lambda *args: stored.append(args) or store_snapshot(*args))
+    result = buffer.sync(db, retry_delay=0)
+
+    assert result['synced'] == 3 and result['pending'] == 0
+    assert stored == []
+    assert snapshot_count(db) == 3
+    session = db.Session()
+    try:
+        assert session.query(IngestReceipt).count() == 3
+    finally:
+        session.close()
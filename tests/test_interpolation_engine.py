@@ -0,0 +1,43 @@
+import random
+
+from src.data.interpolation import interpolate_values
+
+def legacy_values(prev_values, next_values, progress):
+    """The per-value expression of interpolate_missing_days in routes.py"""
+    return [[int(prev + (nxt - prev) * step) for prev, nxt in zip(prev_values, next_values)]
+            for step in progress]
+
+def gap_progress(days):
+    """Progress steps as interpolate_missing_days computes them for a gap of the given length"""
+    return [day / days for day in range(1, days)]
+
+def random_value(rng):
+    return rng.choice([
+        rng.randint(0, 5000),
+        rng.randint(0, 10 ** 7),
+        rng.randint(-50, 50),
+        rng.randint(2 ** 53, 2 ** 60),
+        -rng.randint(2 ** 53, 2 ** 60),
+    ])
+
+def test_matches_legacy_on_random_values():
+    rng = random.Random(2024)
+    for _ in range(500):
+        size = rng.randint(1, 20)
+        prev_values = [random_value(rng) for _ in range(size)]
+        next_values = [random_value(rng) for _ in range(size)]
+        progress = gap_progress(rng.randint(2, 40))
+        assert interpolate_values(prev_values, next_values, progress) == \
+            legacy_values(prev_values, next_values, progress)
+
+def test_matches_legacy_around_the_exact_int_limit():
+    prev_values = [2 ** 53 - 1, -(2 ** 53 - 1), 0, 2 ** 53]
+    next_values = [0, 2 ** 53 - 1, 2 ** 63 - 1, 1]
+    progress = [0.1, 1 / 3, 0.5, 2 / 3, 0.99]
+    for size in range(1, len(prev_values) + 1):
+        assert interpolate_values(prev_values[:size], next_values[:size], progress) == \
+            legacy_values(prev_values[:size], next_values[:size], progress)
+
+def test_handles_empty_input():
+    assert interpolate_values([], [], [0.5]) == [[]]
+    assert interpolate_values([1, 2], [3, 4], []) == []
@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.data.migrations import SNAPSHOT_DAY_KEY_VERSION, applied_versions, prepare, prepare_partitioning, upgrade
+
+def migrated_database(tmp_path):
+    """A new database with every migration applied, as DatabaseManager creates it"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'referral_data.db'}")
+    db = SimpleNamespace(engine=engine, Session=sessionmaker(bind=engine))
+    upgrade(db)
+    return db
+
+def test_partitioning_referral_data_is_refused_after_migration_4(tmp_path):
+    db = migrated_database(tmp_path)
+    assert SNAPSHOT_DAY_KEY_VERSION in applied_versions(db.engine)
+
+    with pytest.raises(RuntimeError):
+        with db.engine.begin() as conn:
+            prepare_partitioning(conn, 'referral_data')
+    with db.engine.begin() as conn:
+        prepare_partitioning(conn, 'referral_snapshot_row')
+    assert SNAPSHOT_DAY_KEY_VERSION in applied_versions(db.engine)
+
+def test_dropping_the_snapshot_day_key_disables_upserts(tmp_path):
+    db = migrated_database(tmp_path)
+
+    with db.engine.begin() as conn:
+        prepare_partitioning(conn, 'referral_data', drop_snapshot_day_key=True)
+    assert SNAPSHOT_DAY_KEY_VERSION not in applied_versions(db.engine)
+
+    # The startup check must not reapply the manual migration on the now-partitioned table
+    assert SNAPSHOT_DAY_KEY_VERSION not in prepare(db)
+    with db.engine.begin() as conn:
+        prepare_partitioning(conn, 'referral_data')
@@ -0,0 +1,152 @@
+import random
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from src.data import db_manager
+
+def legacy_partnership_metrics(records, account):
+    """The dict-and-next() implementation /api/partnership-metrics used before get_partnership_metrics"""
+    account_records = {}
+    for record in records:
+        if record.account_name not in account_records:
+            account_records[record.account_name] = []
+        account_records[record.account_name].append(record)
+
+    results = []
+    partner_metrics = {}
+    for acc_records in account_records.values():
+        if len(acc_records) <= 1:
+            continue
+
+        partner_baselines = {}
+        for record in acc_records:
+            for rec in record.recommending_me:
+                partner = rec['creator']
+                if partner not in partner_baselines:
+                    partner_baselines[partner] = {'received': None, 'sent': None}
+                if partner_baselines[partner]['received'] is None and rec['subscribers'] > 0:
+                    partner_baselines[partner]['received'] = {'value': rec['subscribers'], 'date': record.date}
+            for rec in record.my_recommendations:
+                partner = rec['creator']
+                if partner not in partner_baselines:
+                    partner_baselines[partner] = {'received': None, 'sent': None}
+                if partner_baselines[partner]['sent'] is None and rec['subscribers'] > 0:
+                    partner_baselines[partner]['sent'] = {'value': rec['subscribers'], 'date': record.date}
+
+        period_start = acc_records[0]
+        period_end = acc_records[-1]
+        for partner in partner_baselines:
+            key = partner if account == 'all' else f"{partner}_{period_start.account_name}"
+            if key not in partner_metrics:
+                partner_metrics[key] = {
+                    'partner': partner,
+                    'account': period_start.account_name if account != 'all' else 'All Clients',
+                    'period_received': 0,
+                    'period_sent': 0,
+                    'latest_received': 0,
+                    'latest_sent': 0,
+                    'baseline_received': partner_baselines[partner]['received'],
+                    'baseline_sent': partner_baselines[partner]['sent']
+                }
+            period_end_received = next((rec['subscribers']
+                for rec in period_end.recommending_me if rec['creator'] == partner), 0)
+            period_end_sent = next((rec['subscribers']
+                for rec in period_end.my_recommendations if rec['creator'] == partner), 0)
+            baseline = partner_baselines[partner]
+            if baseline['received'] and baseline['received']['date'] <= period_end.date:
+                partner_metrics[key]['period_received'] = period_end_received - baseline['received']['value']
+            if baseline['sent'] and baseline['sent']['date'] <= period_end.date:
+                partner_metrics[key]['period_sent'] = period_end_sent - baseline['sent']['value']
+            partner_metrics[key]['latest_received'] = period_end_received
+            partner_metrics[key]['latest_sent'] = period_end_sent
+
+    for metrics in partner_metrics.values():
+        metrics['period_balance'] = metrics['period_received'] - metrics['period_sent']
+        metrics['all_time_balance'] = metrics['latest_received'] - metrics['latest_sent']
+        results.append(metrics)
+    results.sort(key=lambda x: x['period_balance'])
+    return results
+
+def make_records(seed, accounts=5, partners=12, days=8):
+    """Random snapshots with missing partners, zero values, duplicates and single-record accounts"""
+    rng = random.Random(seed)
+    names = [f"Partner {i}" for i in range(partners)]
+    start = datetime(2024, 12, 1, 6)
+    records = []
+    for a in range(accounts):
+        snapshot_days = sorted(rng.sample(range(days), rng.randint(1, days)))
+        for day in snapshot_days:
+            def entries():
+                chosen = rng.sample(names, rng.randint(0, partners // 2))
+                if chosen and rng.random() < 0.2:
+                    chosen.append(rng.choice(chosen))  # Same creator listed twice
+                return [{'creator': c, 'subscribers': rng.choice([0, 0, rng.randint(1, 5000)]),
+                         'conversion_rate': None} for c in chosen]
+            records.append(SimpleNamespace(
+                id=None,
+                date=start + timedelta(days=day, minutes=a),
+                account_name=f"Account {a}",
+                recommending_me=entries(),
+                my_recommendations=entries()
+            ))
+    records.sort(key=lambda r: r.date)
+    for i, record in enumerate(records, start=1):
+        record.id = i
+    return records
+
+def store_records(db, records, delete=0, seed=1):
+    """Save the records in shuffled order, delete some, and return the rest in date order"""
+    session = db.Session()
+    for record in random.Random(seed).sample(records, len(records)):
+        record.id = db.add_snapshot(session, record.account_name, record.date,
+                                    record.recommending_me, record.my_recommendations).id
+    session.commit()
+    deleted = set(random.Random(seed + 1).sample([r.id for r in records], delete))
+    if deleted:
+        db.delete_records(session, deleted)
+        session.commit()
+    session.close()
+    return sorted((r for r in records if r.id not in deleted), key=lambda r: (r.date, r.id))
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_manager, 'DATABASE_URL', f"sqlite:///{tmp_path / 'metrics.db'}")
+    return db_manager.DatabaseManager()
+
+def assert_matches_legacy(db, records, range_start, range_end):
+    selected = [r for r in records if range_start <= r.date <= range_end]
+    assert db.get_partnership_metrics(range_start, range_end, 'all') == legacy_partnership_metrics(selected, 'all')
+    for account in sorted({r.account_name for r in records}):
+        account_records = [r for r in selected if r.account_name == account]
+        assert db.get_partnership_metrics(range_start, range_end, account) == \
+            legacy_partnership_metrics(account_records, account)
+
+def test_database_metrics_match_legacy_on_random_data(db):
+    start = datetime(2024, 12, 1)
+    for seed in range(10):
+        records = make_records(seed)
+        for record in records:  # Each seed gets its own accounts and dates in the shared database
+            record.account_name = f"Seed {seed} {record.account_name}"
+            record.date += timedelta(days=20 * seed)
+        records = store_records(db, records)
+        seed_start = start + timedelta(days=20 * seed)
+        for first_day, last_day in [(0, 7), (2, 5), (4, 4)]:
+            assert_matches_legacy(db, records, seed_start + timedelta(days=first_day),
+                                  seed_start + timedelta(days=last_day, hours=23))
+
+def test_database_metrics_handle_empty_ranges(db):
+    assert db.get_partnership_metrics(datetime(2024, 12, 1), datetime(2024, 12, 31), 'all') == []
+    records = store_records(db, make_records(1, accounts=1, days=1))
+    assert db.get_partnership_metrics(datetime(2024, 12, 1), datetime(2024, 12, 31), 'all') == []
+    assert db.get_partnership_metrics(datetime(2024, 12, 1), datetime(2024, 12, 31), records[0].account_name) == []
+
+def test_database_metrics_match_legacy(db):
+    """Persisted baselines, maintained by out-of-order ingest and deletes, give the same rows"""
+    records = store_records(db, make_records(7, accounts=4, days=10), delete=5)
+
+    start = records[0].date.replace(hour=0)
+    for first_day, last_day in [(0, 9), (3, 6), (5, 5)]:
+        assert_matches_legacy(db, records, start + timedelta(days=first_day),
+                              start + timedelta(days=last_day, hours=23))